@@ -0,0 +1,504 @@
+"""Motores de ejecución de KPIs intercambiables: pandas en memoria o DuckDB sobre el Parquet.
+
+Ambos producen las mismas sumas aditivas por agente que ``compute_agent_kpis``, de
+modo que las funciones de ``kpi_calculations`` derivan los KPIs igual con cualquiera.
+
+Verificación de paridad entre motores:
+    python backends.py --paridad
+"""
+import argparse
+import math
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import kpi_calculations as kpi
+from carga_datos import COLUMNAS_CATEGORICAS
+from cubo_diario import CLAVES_CUBO, construir_cubo
+from dataset_particionado import filtros_fecha
+from indice_cuentas import COLUMNAS_INDICE, ResumenCuentas, categorizar_resumen, construir_indice
+from tabla_paginada import FuenteDataFrame
+
+
+@dataclass(frozen=True)
+class Filtros:
+    fecha_inicio: object = None
+    fecha_fin: object = None
+    fila: str = None
+    agente: str = None
+    estados: tuple = None
+
+
+SIN_FILTROS = Filtros()
+# Filas por bloque al recorrer el historial para exportarlo
+FILAS_POR_BLOQUE = 50_000
+
+
+class BackendPandas(FuenteDataFrame):
+    """Implementación actual: operaciones de pandas sobre el DataFrame cargado."""
+
+    nombre = "pandas"
+
+    def _mascara(self, filtros: Filtros):
+        df = self.df
+        mascara = np.ones(len(df), dtype=bool)
+        if filtros.fecha_inicio:
+            mascara &= (df["FECHA"] >= pd.Timestamp(filtros.fecha_inicio)).to_numpy()
+        if filtros.fecha_fin:
+            mascara &= (df["FECHA"] <= pd.Timestamp(filtros.fecha_fin)).to_numpy()
+        if filtros.fila:
+            mascara &= (df["FILA DE COBRANZA"] == filtros.fila).to_numpy()
+        if filtros.agente:
+            mascara &= (df["AGENTE DE COBRANZA"] == filtros.agente).to_numpy()
+        if filtros.estados:
+            mascara &= kpi.mascara_estado(df["ESTADO DEL PAGO PROMETIDO"], filtros.estados)
+        return None if mascara.all() else mascara
+
+    def _subconjunto(self, filtros: Filtros) -> pd.DataFrame:
+        mascara = self._mascara(filtros)
+        return self.df if mascara is None else self.df[mascara]
+
+    def kpis_agentes(self, filtros: Filtros = SIN_FILTROS, por_dia: bool = False) -> pd.DataFrame:
+        return kpi.compute_agent_kpis(self.df, self._mascara(filtros), por_dia)
+
+    def atraso_por_fila_y_estado(self, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+        return kpi.atraso_por_fila_y_estado(self._subconjunto(filtros))
+
+    def distribucion_estado_pago(self, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+        return kpi.distribucion_estado_pago(self._subconjunto(filtros))
+
+    def monto_total_por_dia(self, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+        return kpi.monto_total_por_dia(self._subconjunto(filtros))
+
+    def cubo(self) -> pd.DataFrame:
+        return construir_cubo(self.df)
+
+    def indice_cuentas(self):
+        return construir_indice(self.df)
+
+    def contar_filas(self, filtros: Filtros = SIN_FILTROS) -> int:
+        mascara = self._mascara(filtros)
+        return len(self.df) if mascara is None else int(mascara.sum())
+
+    def bloques_filas(self, filtros: Filtros = SIN_FILTROS, columnas: list = None, filas_por_bloque: int = FILAS_POR_BLOQUE):
+        """Filas que cumplen los filtros en bloques de ``filas_por_bloque``, sin copiar el recorte completo."""
+        df = self.df if columnas is None else self.df[columnas]
+        mascara = self._mascara(filtros)
+        posiciones = np.arange(len(df)) if mascara is None else np.flatnonzero(mascara)
+        # Al menos un bloque, aunque esté vacío, para que el archivo exportado lleve el esquema
+        for inicio in range(0, max(len(posiciones), 1), filas_por_bloque):
+            yield df.iloc[posiciones[inicio:inicio + filas_por_bloque]]
+
+
+def _identificador(columna: str) -> str:
+    return '"' + columna.replace('"', '""') + '"'
+
+
+class BackendDuckDB:
+    """Empuja filtros y agregaciones a DuckDB, que lee el Parquet por bloques sin cargarlo entero.
+
+    El Parquet debe ser la caché de ``carga_datos``, que incluye las columnas derivadas.
+    """
+
+    nombre = "duckdb"
+
+    def __init__(self, ruta_parquet, fecha_inicio=None, fecha_fin=None):
+        """``ruta_parquet`` puede ser una ruta o una lista de particiones; las fechas recortan la vista."""
+        import duckdb
+
+        self._conexion = duckdb.connect()
+        rutas = [ruta_parquet] if isinstance(ruta_parquet, str) else list(ruta_parquet)
+        lista = ", ".join("'" + ruta.replace("'", "''") + "'" for ruta in rutas)
+        # Mismo recorte que ``dataset_particionado.filtros_fecha``; CREATE VIEW no admite parámetros
+        condiciones = [
+            f"\"FECHA\" {operador} TIMESTAMP '{valor.isoformat(sep=' ')}'"
+            for _, operador, valor in filtros_fecha(fecha_inicio, fecha_fin) or []
+        ]
+        where = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        # _archivo y _fila conservan el orden de lectura de pandas: desempatan ordenamientos
+        self._conexion.execute(f"""
+            CREATE VIEW historial_filas AS
+            SELECT * EXCLUDE (filename, file_row_number),
+                   list_position([{lista}], filename) AS _archivo, file_row_number AS _fila
+            FROM read_parquet([{lista}], union_by_name = true, filename = true, file_row_number = true){where}
+        """)
+        self._conexion.execute("CREATE VIEW historial AS SELECT * EXCLUDE (_archivo, _fila) FROM historial_filas")
+        self._tipos = dict(self._conexion.execute("SELECT column_name, column_type FROM (DESCRIBE historial)").fetchall())
+        self._candado = threading.Lock()
+
+    def _consulta(self, sql: str, parametros=None) -> pd.DataFrame:
+        # Cada hilo usa su propio cursor; la base en memoria es compartida
+        with self._candado:
+            cursor = self._conexion.cursor()
+        try:
+            return cursor.execute(sql, parametros or []).df()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _where(filtros: Filtros, extra: list = None):
+        condiciones, parametros = list(extra or []), []
+        if filtros.fecha_inicio:
+            condiciones.append('"FECHA" >= ?')
+            parametros.append(pd.Timestamp(filtros.fecha_inicio).to_pydatetime())
+        if filtros.fecha_fin:
+            condiciones.append('"FECHA" <= ?')
+            parametros.append(pd.Timestamp(filtros.fecha_fin).to_pydatetime())
+        if filtros.fila:
+            condiciones.append('"FILA DE COBRANZA" = ?')
+            parametros.append(filtros.fila)
+        if filtros.agente:
+            condiciones.append('"AGENTE DE COBRANZA" = ?')
+            parametros.append(filtros.agente)
+        if filtros.estados:
+            condiciones.append(f'"ESTADO DEL PAGO PROMETIDO" IN ({", ".join("?" * len(filtros.estados))})')
+            parametros.extend(filtros.estados)
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def kpis_agentes(self, filtros: Filtros = SIN_FILTROS, por_dia: bool = False) -> pd.DataFrame:
+        extra = ['"AGENTE DE COBRANZA" IS NOT NULL'] + (['"FECHA" IS NOT NULL'] if por_dia else [])
+        where, parametros = self._where(filtros, extra)
+        claves = ["AGENTE DE COBRANZA"] + (["DIA"] if por_dia else [])
+        sql = f"""
+            WITH base AS (
+                SELECT
+                    "AGENTE DE COBRANZA" AS agente,
+                    CAST(date_trunc('day', "FECHA") AS TIMESTAMP) AS dia,
+                    "ESTADO DEL PAGO PROMETIDO" AS estado,
+                    "ES_PAGADO" AS pagado,
+                    "ES_PENDIENTE" AS pendiente,
+                    "ALTO_RIESGO" AS alto_riesgo,
+                    "CFRNID" IS NOT NULL AS con_id,
+                    CAST("MONTO DE PAGO PROMETIDO" AS DOUBLE) AS prometido,
+                    CAST("MONTO DE PAGO" AS DOUBLE) AS pago,
+                    CAST("DIAS_PROMESA_A_PAGO" AS DOUBLE) AS dias
+                FROM historial{where}
+            ), indicadores AS (
+                SELECT *, coalesce(pagado AND prometido > 0, false) AS liquidada FROM base
+            )
+            SELECT
+                agente AS "AGENTE DE COBRANZA",
+                {'dia AS "DIA",' if por_dia else ''}
+                coalesce(sum(prometido), 0) AS "MONTO PROMETIDO",
+                coalesce(sum(CASE WHEN estado = 'COMPLETO' THEN pago ELSE 0 END), 0) AS "MONTO COMPLETO",
+                coalesce(sum(CASE WHEN estado = 'PARCIAL' THEN pago ELSE 0 END), 0) AS "MONTO PARCIAL",
+                coalesce(sum(CASE WHEN estado = 'PENDIENTE' THEN pago ELSE 0 END), 0) AS "MONTO SIN PAGO",
+                count(*) FILTER (WHERE pagado) AS "PAGADAS",
+                count(*) FILTER (WHERE pagado AND con_id) AS "PAGADAS CON ID",
+                count(*) FILTER (WHERE pendiente) AS "PENDIENTES",
+                count(*) FILTER (WHERE alto_riesgo) AS "ALTO RIESGO",
+                count(*) FILTER (WHERE pagado AND dias > 0) AS "PAGOS TARDIOS",
+                coalesce(sum(dias) FILTER (WHERE pagado), 0) AS "DIAS PAGADAS SUMA",
+                count(dias) FILTER (WHERE pagado) AS "DIAS PAGADAS N",
+                count(*) FILTER (WHERE liquidada) AS "LIQUIDADAS",
+                coalesce(sum(prometido) FILTER (WHERE liquidada), 0) AS "LIQUIDADAS PROMETIDO",
+                coalesce(sum(pago) FILTER (WHERE liquidada), 0) AS "LIQUIDADAS PAGADO",
+                coalesce(sum(dias) FILTER (WHERE liquidada), 0) AS "DIAS LIQUIDADAS SUMA",
+                count(dias) FILTER (WHERE liquidada) AS "DIAS LIQUIDADAS N"
+            FROM indicadores
+            GROUP BY ALL
+        """
+        resultado = self._consulta(sql, parametros)
+        return resultado.set_index(claves).sort_index()
+
+    def atraso_por_fila_y_estado(self, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+        where, parametros = self._where(filtros, [
+            """"ESTADO DEL PAGO PROMETIDO" IN ('COMPLETO', 'PARCIAL', 'PENDIENTE')""",
+            '"FILA DE COBRANZA" IS NOT NULL',
+        ])
+        sql = f"""
+            SELECT "FILA DE COBRANZA", "ESTADO DEL PAGO PROMETIDO",
+                   avg(coalesce(CAST("{kpi.COLUMNA_ATRASO}" AS DOUBLE), 0)) AS "PROMEDIO DIAS DE ATRASO",
+                   count("CFRNID") AS "TOTAL CASOS"
+            FROM historial{where}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """
+        return self._consulta(sql, parametros)
+
+    def distribucion_estado_pago(self, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+        where, parametros = self._where(filtros, ['"ESTADO DEL PAGO PROMETIDO" IS NOT NULL'])
+        sql = f"""
+            SELECT "ESTADO DEL PAGO PROMETIDO" AS "% del Total", count(*) / sum(count(*)) OVER () AS proportion
+            FROM historial{where}
+            GROUP BY 1
+            ORDER BY 2 DESC, 1
+        """
+        return self._consulta(sql, parametros)
+
+    def monto_total_por_dia(self, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+        where, parametros = self._where(filtros, [
+            """"ESTADO DEL PAGO PROMETIDO" IN ('COMPLETO', 'PARCIAL')""",
+            '"FECHA" IS NOT NULL',
+        ])
+        sql = f"""
+            SELECT "FECHA", coalesce(sum(CAST("MONTO DE PAGO" AS DOUBLE)), 0) AS "MONTO TOTAL"
+            FROM historial{where}
+            GROUP BY 1
+            ORDER BY 1
+        """
+        return self._consulta(sql, parametros)
+
+    def cubo(self) -> pd.DataFrame:
+        sql = f"""
+            SELECT
+                CAST(date_trunc('day', "FECHA") AS TIMESTAMP) AS "DIA",
+                "AGENTE DE COBRANZA", "FILA DE COBRANZA", "ESTADO DEL PAGO PROMETIDO",
+                count(*) AS "REGISTROS",
+                count("CFRNID") AS "CUENTAS",
+                coalesce(sum(CAST("MONTO DE PAGO" AS DOUBLE)), 0) AS "MONTO DE PAGO",
+                coalesce(sum(CAST("MONTO DE PAGO PROMETIDO" AS DOUBLE)), 0) AS "MONTO DE PAGO PROMETIDO",
+                coalesce(sum(CAST("{kpi.COLUMNA_ATRASO}" AS DOUBLE)), 0) AS "ATRASO SUMA",
+                count("{kpi.COLUMNA_ATRASO}") AS "ATRASO N"
+            FROM historial
+            WHERE "FECHA" IS NOT NULL
+            GROUP BY ALL
+            ORDER BY 1, 2 NULLS LAST, 3 NULLS LAST, 4 NULLS LAST
+        """
+        cubo = self._consulta(sql)
+        for columna in CLAVES_CUBO[1:]:
+            cubo[columna] = pd.Categorical(cubo[columna])
+        return cubo
+
+    def indice_cuentas(self):
+        # Solo el resumen por cuenta llega a memoria; el historial de cada cuenta se consulta al pedirlo
+        return CuentasDuckDB(self)
+
+    def contar_filas(self, filtros: Filtros = SIN_FILTROS) -> int:
+        where, parametros = self._where(filtros)
+        return int(self._consulta(f"SELECT count(*) FROM historial{where}", parametros).iloc[0, 0])
+
+    def bloques_filas(self, filtros: Filtros = SIN_FILTROS, columnas: list = None, filas_por_bloque: int = FILAS_POR_BLOQUE):
+        """Lotes de Arrow leídos del Parquet a medida que se consumen."""
+        where, parametros = self._where(filtros)
+        seleccion = ", ".join(_identificador(c) for c in columnas) if columnas else "*"
+        with self._candado:
+            cursor = self._conexion.cursor()
+        try:
+            lector = cursor.execute(f"SELECT {seleccion} FROM historial{where}", parametros).fetch_record_batch(filas_por_bloque)
+            vacio = True
+            for lote in lector:
+                vacio = False
+                yield lote
+            if vacio:
+                yield lector.schema.empty_table()
+        finally:
+            cursor.close()
+
+    # Interfaz de fuente para ``mostrar_tabla_paginada``
+
+    def columnas(self) -> list:
+        return list(self._tipos)
+
+    def columnas_categoricas(self) -> list:
+        return [c for c in COLUMNAS_CATEGORICAS if c in self._tipos]
+
+    def opciones(self, columna: str) -> list:
+        col = _identificador(columna)
+        sql = f"SELECT DISTINCT {col} FROM historial WHERE {col} IS NOT NULL ORDER BY 1 LIMIT 5000"
+        return self._consulta(sql).iloc[:, 0].tolist()
+
+    def total_filas(self) -> int:
+        return int(self._consulta("SELECT count(*) FROM historial").iloc[0, 0])
+
+    def preparar_pagina(self, busqueda="", filtros=None, orden=None, ascendente=True, pagina=1, tam_pagina=50, columnas=None):
+        tipos = self._tipos if columnas is None else {c: self._tipos[c] for c in columnas}
+        condiciones, parametros = [], []
+        for columna, valores in (filtros or {}).items():
+            if valores:
+                condiciones.append(f"{_identificador(columna)} IN ({', '.join('?' * len(valores))})")
+                parametros.extend(valores)
+        if busqueda:
+            textuales = [c for c, tipo in tipos.items() if tipo == "VARCHAR"]
+            if busqueda.isdigit():
+                textuales += [c for c, tipo in tipos.items() if "INT" in tipo]
+            coincidencias = [f"contains(lower(CAST({_identificador(c)} AS VARCHAR)), ?)" for c in textuales]
+            condiciones.append("(" + " OR ".join(coincidencias or ["false"]) + ")")
+            parametros.extend([busqueda.lower()] * len(coincidencias))
+        where = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+
+        filas = int(self._consulta(f"SELECT count(*) FROM historial{where}", parametros).iloc[0, 0])
+        total_paginas = max(1, math.ceil(filas / tam_pagina))
+        pagina = min(max(1, pagina), total_paginas)
+        # Los empates siguen el orden de lectura, como el ordenamiento estable de pandas,
+        # para que las páginas no repitan ni omitan filas
+        orden_sql = (
+            f" ORDER BY {_identificador(orden)} {'ASC' if ascendente else 'DESC'} NULLS LAST, _archivo, _fila" if orden else ""
+        )
+        seleccion = ", ".join(_identificador(c) for c in tipos)
+        sql = f"SELECT {seleccion} FROM historial_filas{where}{orden_sql} LIMIT {int(tam_pagina)} OFFSET {int((pagina - 1) * tam_pagina)}"
+        return self._consulta(sql, parametros), filas, total_paginas
+
+
+class CuentasDuckDB(ResumenCuentas):
+    """Misma interfaz que ``IndiceCuentas``: el resumen se agrega en DuckDB y cada historial es una consulta."""
+
+    # Orden de ``IndiceCuentas``: por fecha, sin fecha al final y en empate por orden de lectura
+    ORDEN = '"FECHA" NULLS LAST, _archivo, _fila'
+
+    def __init__(self, backend: BackendDuckDB):
+        self._backend = backend
+        atraso = f"CAST({_identificador(kpi.COLUMNA_ATRASO)} AS DOUBLE)"
+        ultima = "{'fecha': \"FECHA\", 'archivo': _archivo, 'fila': _fila}"
+        sql = f"""
+            SELECT
+                "CFRNID",
+                arg_max_null("AGENTE DE COBRANZA", {ultima}) AS "AGENTE DE COBRANZA",
+                arg_max_null("FILA DE COBRANZA", {ultima}) AS "FILA DE COBRANZA",
+                count(*) AS "REGISTROS",
+                arg_max_null("FECHA", {ultima}) AS "ULTIMA FECHA",
+                arg_max_null("FECHA_PROMESA", {ultima}) AS "ULTIMA PROMESA",
+                arg_max_null("ESTADO DEL PAGO PROMETIDO", {ultima}) AS "ULTIMO ESTADO",
+                coalesce(sum(CAST("MONTO DE PAGO PROMETIDO" AS DOUBLE)), 0) AS "MONTO PROMETIDO",
+                coalesce(sum(CAST("MONTO DE PAGO" AS DOUBLE)), 0) AS "MONTO PAGADO",
+                max({atraso}) AS "MAX DIAS DE ATRASO",
+                count(*) FILTER (WHERE "ALTO_RIESGO") AS "PROMESAS ALTO RIESGO"
+            FROM historial_filas
+            WHERE "CFRNID" IS NOT NULL
+            GROUP BY "CFRNID"
+            ORDER BY "CFRNID"
+        """
+        super().__init__(categorizar_resumen(backend._consulta(sql).set_index("CFRNID")))
+
+    def historial_cuenta(self, cfrnid) -> pd.DataFrame:
+        i = self._buscar(cfrnid)
+        columnas = [c for c in COLUMNAS_INDICE if c in self._backend._tipos]
+        seleccion = ", ".join(_identificador(c) for c in columnas)
+        if i < 0:
+            return pd.DataFrame(columns=columnas)
+        sql = f'SELECT {seleccion} FROM historial_filas WHERE "CFRNID" = ? ORDER BY {self.ORDEN}'
+        return self._backend._consulta(sql, [self.cuentas[i].item()])
+
+
+def crear_backend(nombre: str, ruta_parquet=None, df: pd.DataFrame = None, fecha_inicio=None, fecha_fin=None):
+    if nombre == "duckdb":
+        return BackendDuckDB(ruta_parquet, fecha_inicio, fecha_fin)
+    if nombre == "pandas":
+        return BackendPandas(df if df is not None else pd.read_parquet(ruta_parquet))
+    raise ValueError(f"Backend desconocido: {nombre}")
+
+
+# Funciones de módulo para memoizar las consultas de cualquier backend
+
+def kpis_agentes(backend, filtros: Filtros = SIN_FILTROS, por_dia: bool = False) -> pd.DataFrame:
+    return backend.kpis_agentes(filtros, por_dia)
+
+
+def atraso_por_fila_y_estado(backend, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+    return backend.atraso_por_fila_y_estado(filtros)
+
+
+def distribucion_estado_pago(backend, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+    return backend.distribucion_estado_pago(filtros)
+
+
+def monto_total_por_dia(backend, filtros: Filtros = SIN_FILTROS) -> pd.DataFrame:
+    return backend.monto_total_por_dia(filtros)
+
+
+def _comparar(nombre: str, a: pd.DataFrame, b: pd.DataFrame, diferencias: list) -> None:
+    a = a.reset_index(drop=a.index.name is None)
+    b = b.reset_index(drop=b.index.name is None)
+    for tabla in (a, b):
+        for columna in tabla.columns:
+            if isinstance(tabla[columna].dtype, pd.CategoricalDtype) or tabla[columna].dtype == object:
+                tabla[columna] = tabla[columna].astype(object)
+    try:
+        pd.testing.assert_frame_equal(
+            a.reset_index(drop=True), b.reset_index(drop=True),
+            check_dtype=False, check_column_type=False, check_index_type=False, rtol=1e-9, atol=1e-6,
+        )
+    except AssertionError as error:
+        diferencias.append(f"{nombre}: {error}")
+
+
+def verificar_paridad(df: pd.DataFrame, ruta_parquet: str, filtros_prueba: list = None) -> list:
+    """Compara las tablas de KPIs de ambos backends; devuelve la lista de diferencias."""
+    pandas_ = BackendPandas(df)
+    duck = BackendDuckDB(ruta_parquet)
+    fechas = df["FECHA"].dropna()
+    mitad = fechas.min() + (fechas.max() - fechas.min()) / 2
+    fila = df["FILA DE COBRANZA"].dropna().iloc[0] if df["FILA DE COBRANZA"].notna().any() else None
+    agente = df["AGENTE DE COBRANZA"].dropna().iloc[0] if df["AGENTE DE COBRANZA"].notna().any() else None
+    filtros_prueba = filtros_prueba or [
+        SIN_FILTROS,
+        Filtros(fecha_inicio=mitad.normalize()),
+        Filtros(fecha_fin=mitad.normalize(), fila=fila),
+        Filtros(agente=agente),
+        Filtros(estados=tuple(kpi.ESTADOS_PAGADOS)),
+    ]
+
+    diferencias = []
+    vistas = [
+        kpi.calcular_efectividad_por_agente, kpi.monto_prometido_vs_pagado, kpi.cuentas_alto_riesgo,
+        kpi.indicadores_dso_rr_sr, kpi.indicadores_lpr_acp, kpi.indicadores_nsr_rr,
+    ]
+    for filtros in filtros_prueba:
+        kpis_pandas, kpis_duck = pandas_.kpis_agentes(filtros), duck.kpis_agentes(filtros)
+        _comparar(f"kpis_agentes {filtros}", kpis_pandas, kpis_duck, diferencias)
+        _comparar(
+            f"kpis_agentes por día {filtros}",
+            pandas_.kpis_agentes(filtros, por_dia=True), duck.kpis_agentes(filtros, por_dia=True), diferencias
+        )
+        for vista in vistas:
+            _comparar(f"{vista.__name__} {filtros}", vista(None, kpis_pandas), vista(None, kpis_duck), diferencias)
+        for metodo in ("atraso_por_fila_y_estado", "distribucion_estado_pago", "monto_total_por_dia"):
+            a, b = getattr(pandas_, metodo)(filtros), getattr(duck, metodo)(filtros)
+            if metodo == "distribucion_estado_pago":
+                # Con dtype categórico pandas incluye estados sin registros, y el orden
+                # entre estados con la misma frecuencia no está definido
+                a, b = (t[t["proportion"] > 0].sort_values(list(t.columns)) for t in (a, b))
+            _comparar(f"{metodo} {filtros}", a, b, diferencias)
+    _comparar("cubo", pandas_.cubo(), duck.cubo(), diferencias)
+    indice_pandas, indice_duck = pandas_.indice_cuentas(), duck.indice_cuentas()
+    _comparar("resumen de cuentas", indice_pandas.resumen, indice_duck.resumen, diferencias)
+    # La cuenta con más registros ejercita el orden por fecha y sus empates
+    if len(indice_pandas.resumen):
+        cuenta = indice_pandas.resumen["REGISTROS"].idxmax()
+        _comparar(
+            f"historial de la cuenta {cuenta}",
+            indice_pandas.historial_cuenta(cuenta), indice_duck.historial_cuenta(cuenta), diferencias
+        )
+    return diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backends de ejecución de KPIs.")
+    parser.add_argument("--paridad", action="store_true", help="Compara pandas y DuckDB")
+    parser.add_argument("--origen", default=os.path.join("data", "Historial_Pagos_Prestamos.xlsx"))
+    parser.add_argument("--filas-sinteticas", type=int, default=200_000)
+    args = parser.parse_args()
+    if not args.paridad:
+        parser.print_help()
+        return
+
+    from carga_datos import asegurar_cache, ruta_cache
+    from datos_sinteticos import generar_historial
+
+    casos = []
+    if os.path.exists(args.origen):
+        asegurar_cache(args.origen)
+        casos.append((args.origen, pd.read_parquet(ruta_cache(args.origen)), ruta_cache(args.origen)))
+    with tempfile.TemporaryDirectory() as directorio:
+        if args.filas_sinteticas:
+            sintetico = generar_historial(args.filas_sinteticas)
+            ruta = os.path.join(directorio, "sintetico.parquet")
+            sintetico.to_parquet(ruta, index=False)
+            casos.append((f"sintético ({args.filas_sinteticas} filas)", sintetico, ruta))
+
+        fallos = 0
+        for nombre, df, ruta in casos:
+            diferencias = verificar_paridad(df, ruta)
+            fallos += len(diferencias)
+            print(f"{nombre}: {'OK' if not diferencias else f'{len(diferencias)} diferencias'}")
+            for diferencia in diferencias:
+                print("  " + diferencia.replace("\n", "\n    "))
+    raise SystemExit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
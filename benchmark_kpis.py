@@ -0,0 +1,155 @@
+"""Mide tiempo y memoria pico de cada KPI sobre historiales sintéticos de distintos tamaños.
+
+Uso:
+    python benchmark_kpis.py --escalas 10000 100000 1000000 --salida bench.json
+    python benchmark_kpis.py --escalas 10000 100000 --comparar bench_anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import kpi_calculations as kpi
+from carga_datos import normalizar_historial
+from cubo_diario import construir_cubo
+from datos_sinteticos import generar_historial
+
+ESCALAS = [10_000, 100_000, 1_000_000, 10_000_000]
+RUTA_MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+SEGUNDOS_MAXIMOS_RECARGA = 600
+
+
+def escribir_particiones(df: pd.DataFrame, directorio: str) -> None:
+    """Escribe el historial sin normalizar como un CSV por mes, el formato de ``DASHBOARD_DATASET``."""
+    for mes, parte in df.groupby(df["FECHA"].str[:7]):
+        parte.to_csv(os.path.join(directorio, f"historial_{mes}.csv"), index=False)
+
+
+def render_main(directorio: str):
+    """Prepara main.py con AppTest sobre ``directorio`` y devuelve una recarga de todas las secciones.
+
+    La primera ejecución carga el dataset en las cachés de Streamlit. Cada recarga medida
+    vacía la caché de KPIs y recorre todos los grupos de secciones, así se miden los
+    cálculos de main.py tal como están y no una copia.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    from memoizacion import cache_kpis
+
+    os.environ["DASHBOARD_DATASET"] = directorio
+    app = AppTest.from_file(RUTA_MAIN, default_timeout=SEGUNDOS_MAXIMOS_RECARGA)
+    app.run()
+    app.sidebar.selectbox(key="periodo_carga").set_value("Todo el historial").run()
+    grupos = app.sidebar.radio(key="seccion_activa").options
+
+    def recargar():
+        cache_kpis.limpiar()
+        for grupo in grupos:
+            app.sidebar.radio(key="seccion_activa").set_value(grupo).run()
+            if app.exception:
+                raise RuntimeError(f"{grupo}: {app.exception[0].value}")
+
+    return recargar
+
+
+def casos(df: pd.DataFrame) -> dict:
+    fecha_min, fecha_max = df["FECHA"].min(), df["FECHA"].max()
+    return {
+        "compute_agent_kpis": lambda: kpi.compute_agent_kpis(df),
+        "calcular_efectividad_por_agente": lambda: kpi.calcular_efectividad_por_agente(df),
+        "monto_prometido_vs_pagado": lambda: kpi.monto_prometido_vs_pagado(df),
+        "distribucion_estado_pago": lambda: kpi.distribucion_estado_pago(df),
+        "monto_total_por_dia": lambda: kpi.monto_total_por_dia(df),
+        "cuentas_alto_riesgo": lambda: kpi.cuentas_alto_riesgo(df),
+        "indicadores_dso_rr_sr": lambda: kpi.indicadores_dso_rr_sr(df),
+        "indicadores_lpr_acp": lambda: kpi.indicadores_lpr_acp(df),
+        "indicadores_nsr_rr": lambda: kpi.indicadores_nsr_rr(df),
+        "atraso_por_fila_y_estado": lambda: kpi.atraso_por_fila_y_estado(df),
+        "productividad_por_agente": lambda: kpi.productividad_por_agente(df, fecha_min, fecha_max, "M2"),
+        "construir_cubo": lambda: construir_cubo(df),
+    }
+
+
+def medir(funcion, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    # La memoria se mide en una corrida aparte porque tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"segundos": min(tiempos), "segundos_mediana": sorted(tiempos)[len(tiempos) // 2], "pico_mb": pico / 1e6}
+
+
+def commit_actual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def ejecutar(escalas: list, repeticiones: int, semilla: int, funciones: list = None) -> dict:
+    resultados = []
+    for filas in escalas:
+        crudo = generar_historial(filas, semilla=semilla, normalizar=False)
+        df = normalizar_historial(crudo.copy())
+        with tempfile.TemporaryDirectory() as directorio:
+            casos_escala = casos(df)
+            if not funciones or "render_main" in funciones:
+                escribir_particiones(crudo, directorio)
+                casos_escala["render_main"] = render_main(directorio)
+            for nombre, funcion in casos_escala.items():
+                if funciones and nombre not in funciones:
+                    continue
+                medicion = medir(funcion, repeticiones)
+                resultados.append({"filas": filas, "funcion": nombre, **medicion})
+                print(f"{filas:>10} {nombre:<35} {medicion['segundos']:>9.4f} s {medicion['pico_mb']:>9.1f} MB", flush=True)
+    return {
+        "commit": commit_actual(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+def comparar(actual: dict, anterior: dict) -> None:
+    previos = {(r["filas"], r["funcion"]): r for r in anterior["resultados"]}
+    print(f"\nComparación contra {anterior.get('commit') or 'referencia'} (actual / anterior):")
+    for r in actual["resultados"]:
+        previo = previos.get((r["filas"], r["funcion"]))
+        if previo and previo["segundos"] > 0:
+            print(f"{r['filas']:>10} {r['funcion']:<35} tiempo x{r['segundos'] / previo['segundos']:.2f}"
+                  f"  memoria x{r['pico_mb'] / max(previo['pico_mb'], 1e-9):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de kpi_calculations sobre datos sintéticos.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--funciones", nargs="*", help="Limita el benchmark a estas funciones")
+    parser.add_argument("--salida", default="bench_output.json")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para calcular la variación")
+    args = parser.parse_args()
+
+    resultado = ejecutar(args.escalas, args.repeticiones, args.semilla, args.funciones)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+
+from kpi_calculations import COLUMNAS_DERIVADAS, agregar_columnas_derivadas
+
+# Se incrementa cuando cambia la normalización para invalidar cachés anteriores
+VERSION_CACHE = "3"
+CLAVE_METADATOS = b"didi_prestamos.huella"
+CLAVE_INCREMENTOS = b"didi_prestamos.incrementos"
+CLAVE_GENERACION = b"didi_prestamos.generacion"
+CLAVES_DEDUPLICACION = ["CFRNID", "FECHA"]
+# Orígenes cuya caché no se pudo escribir, con el tamaño y mtime que tenían entonces
+_sin_cache = {}
+# Tamaño, mtime y sha del Excel cuyo contenido ya se comprobó igual al del Parquet
+_contenido_verificado = {}
+
+COLUMNAS_NUMERICAS = [
+    "MONTO DE PAGO PROMETIDO",
+    "MONTO DE PAGO",
+    "DIAS DE ATRASO EN EL MOMENTO DEL PAGO PROMETIDO",
+]
+
+# Columnas de baja cardinalidad que se guardan como categóricas (códigos enteros + diccionario)
+COLUMNAS_CATEGORICAS = [
+    "DESPACHO DE COBRANZA",
+    "AGENTE DE COBRANZA",
+    "FILA DE COBRANZA",
+    "ANTIGÜEDAD DEL RETRASO AL MOMENTO DEL PAGO PROMETIDO",
+    "ESTADO DEL PAGO PROMETIDO",
+]
+
+
+def ruta_cache(ruta_origen: str) -> str:
+    return os.path.splitext(ruta_origen)[0] + ".parquet"
+
+
+def huella_archivo(ruta: str) -> dict:
+    info = os.stat(ruta)
+    return {"tamano": info.st_size, "mtime": info.st_mtime_ns}
+
+
+def hash_contenido(ruta: str, tam_bloque: int = 1 << 20) -> str:
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def normalizar_historial(df: pd.DataFrame) -> pd.DataFrame:
+    """Parsea FECHA, homogeneiza tipos y agrega las columnas derivadas una sola vez, antes de persistir."""
+    if "FECHA" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["FECHA"]):
+        df["FECHA"] = pd.to_datetime(df["FECHA"], format="ISO8601", errors="coerce")
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    # Columnas de texto con celdas mixtas (p. ej. fechas y "-") no se pueden guardar en Parquet
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return agregar_columnas_derivadas(compactar_tipos(df))
+
+
+def compactar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduce el tamaño en memoria: categóricas para texto repetido y enteros reducidos.
+
+    Los montos se mantienen en float64 para que las sumas por agente no pierdan centavos.
+    """
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.Categorical(df[col].astype(object))
+    columna_atraso = "DIAS DE ATRASO EN EL MOMENTO DEL PAGO PROMETIDO"
+    if columna_atraso in df.columns:
+        df[columna_atraso] = pd.to_numeric(df[columna_atraso], downcast="integer")
+    if "CFRNID" in df.columns and pd.api.types.is_integer_dtype(df["CFRNID"]):
+        df["CFRNID"] = pd.to_numeric(df["CFRNID"], downcast="integer")
+    return df
+
+
+def leer_archivo_datos(ruta: str) -> pd.DataFrame:
+    """Lee un Excel o CSV con el esquema del historial y lo normaliza."""
+    if ruta.lower().endswith(".csv"):
+        return normalizar_historial(pd.read_csv(ruta))
+    return normalizar_historial(pd.read_excel(ruta))
+
+
+def leer_excel_por_bloques(archivo, filas_por_bloque: int = 10_000):
+    """Lee la primera hoja en modo solo lectura, entregando DataFrames de ``filas_por_bloque``.
+
+    openpyxl no materializa el libro completo, así que la memoria del parseo queda
+    acotada al bloque. Cada paso devuelve (bloque, filas leídas, total estimado o None).
+    """
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        total = hoja.max_row - 1 if hoja.max_row else None
+        filas = hoja.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(encabezado)]
+        leidas, bloque = 0, []
+        for fila in filas:
+            if all(valor is None for valor in fila):
+                continue
+            bloque.append(fila[:len(columnas)])
+            if len(bloque) == filas_por_bloque:
+                leidas += len(bloque)
+                yield _bloque_a_dataframe(bloque, columnas), leidas, total
+                bloque = []
+        if bloque:
+            leidas += len(bloque)
+            yield _bloque_a_dataframe(bloque, columnas), leidas, total
+    finally:
+        libro.close()
+
+
+def _bloque_a_dataframe(filas: list, columnas: list) -> pd.DataFrame:
+    # El mismo analizador que usa pd.read_excel, así cada bloque infiere los mismos tipos
+    # (p. ej. CFRNID guardado como texto vuelve como entero)
+    df = TextParser([columnas, *filas], header=0).read()
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def combinar_historial(historial: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Anexa ``delta`` al historial; sus filas reemplazan a las existentes con el mismo CFRNID y FECHA."""
+    delta = delta.drop_duplicates(subset=CLAVES_DEDUPLICACION, keep="last")
+    repetidas = pd.MultiIndex.from_frame(historial[CLAVES_DEDUPLICACION]).isin(
+        pd.MultiIndex.from_frame(delta[CLAVES_DEDUPLICACION])
+    )
+    combinado = pd.concat([historial[~repetidas], delta], ignore_index=True)
+    # concat pierde el tipo categórico cuando las categorías difieren
+    return compactar_tipos(combinado)
+
+
+def directorio_incrementos(ruta_origen: str) -> str:
+    return os.path.join(os.path.dirname(ruta_origen), "incrementos")
+
+
+# Huella del Excel base con el que se conciliaron los archivos de ``incrementos/``
+ARCHIVO_BASE_INCREMENTOS = "base.sha256"
+
+
+def archivos_incrementos(ruta_origen: str) -> list:
+    directorio = directorio_incrementos(ruta_origen)
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(
+        os.path.join(directorio, nombre) for nombre in os.listdir(directorio)
+        if nombre.lower().endswith((".xlsx", ".csv"))
+    )
+
+
+def leer_metadatos(ruta: str):
+    """Huella del origen e incrementos aplicados guardados en el Parquet del historial."""
+    try:
+        metadatos = pq.read_schema(ruta).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    valor = metadatos.get(CLAVE_METADATOS)
+    if valor is None:
+        return None
+    version, tamano, mtime, sha = valor.decode().split("|")
+    incrementos = metadatos.get(CLAVE_INCREMENTOS, b"")
+    return {
+        "version": version,
+        "tamano": int(tamano),
+        "mtime": int(mtime),
+        "sha256": sha,
+        "incrementos": [h for h in incrementos.decode().split(",") if h],
+    }
+
+
+@contextmanager
+def escritura_atomica(ruta: str):
+    """Ruta temporal única junto a ``ruta`` que la reemplaza si el bloque termina sin error.
+
+    Cada escritor tiene su propio temporal, así dos procesos que reconstruyen la misma
+    caché no se pisan: el último ``os.replace`` deja un archivo completo.
+    """
+    descriptor, temporal = tempfile.mkstemp(
+        dir=os.path.dirname(ruta) or ".", prefix=os.path.basename(ruta) + ".", suffix=".tmp"
+    )
+    os.close(descriptor)
+    # mkstemp crea el archivo solo legible por su dueño
+    os.chmod(temporal, 0o644)
+    try:
+        yield temporal
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+
+
+def escribir_parquet(df: pd.DataFrame, ruta: str, metadatos: dict) -> None:
+    """Escribe ``df`` de forma atómica añadiendo ``metadatos`` al esquema."""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), **metadatos})
+    with escritura_atomica(ruta) as temporal:
+        pq.write_table(tabla, temporal)
+
+
+def guardar_historial(df: pd.DataFrame, ruta_origen: str, huella: dict, incrementos: list) -> str:
+    """Persiste el historial junto al origen y devuelve su nueva generación."""
+    valor = f"{VERSION_CACHE}|{huella['tamano']}|{huella['mtime']}|{huella['sha256']}"
+    generacion = hashlib.sha256(f"{valor}|{','.join(incrementos)}".encode()).hexdigest()[:16]
+    escribir_parquet(df, ruta_cache(ruta_origen), {
+        CLAVE_METADATOS: valor.encode(),
+        CLAVE_INCREMENTOS: ",".join(incrementos).encode(),
+        CLAVE_GENERACION: generacion.encode(),
+    })
+    return generacion
+
+
+def leer_generacion(ruta: str) -> str:
+    try:
+        metadatos = pq.read_schema(ruta).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return ""
+    return metadatos.get(CLAVE_GENERACION, b"").decode()
+
+
+def generacion_historial(ruta_origen: str) -> str:
+    return leer_generacion(ruta_cache(ruta_origen))
+
+
+def huella_dataset(ruta_origen: str) -> str:
+    """Cambia cuando cambia el Excel o cuando se anexan incrementos al Parquet.
+
+    Es la generación guardada en el Parquet vigente, leída después de construirlo, así
+    que no cambia cuando la primera carga crea la caché. Sin caché escribible se usa
+    el tamaño y la fecha del Excel, sin volver a intentar construirla en cada recarga.
+    """
+    actual = huella_archivo(ruta_origen)
+    if _sin_cache.get(ruta_origen) != (actual["tamano"], actual["mtime"]):
+        generacion = leer_generacion(asegurar_cache(ruta_origen))
+        if generacion:
+            return generacion
+    return "|".join(str(v) for v in actual.values())
+
+
+def cache_vigente(ruta_origen: str) -> bool:
+    """Indica si el Parquet junto al origen corresponde al archivo actual."""
+    guardada = leer_metadatos(ruta_cache(ruta_origen))
+    if guardada is None or guardada["version"] != VERSION_CACHE:
+        return False
+    actual = huella_archivo(ruta_origen)
+    if (guardada["tamano"], guardada["mtime"]) == (actual["tamano"], actual["mtime"]):
+        return True
+    # Un redeploy cambia el mtime sin cambiar el contenido; el hash se calcula una vez por mtime
+    verificado = (actual["tamano"], actual["mtime"], guardada["sha256"])
+    if _contenido_verificado.get(ruta_origen) == verificado:
+        return True
+    if guardada["tamano"] == actual["tamano"] and guardada["sha256"] == hash_contenido(ruta_origen):
+        _contenido_verificado[ruta_origen] = verificado
+        return True
+    return False
+
+
+def _leer_base_conciliada(ruta_origen: str):
+    try:
+        with open(os.path.join(directorio_incrementos(ruta_origen), ARCHIVO_BASE_INCREMENTOS), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        guardada = leer_metadatos(ruta_cache(ruta_origen))
+        return guardada["sha256"] if guardada else None
+
+
+def _retirar_incremento(ruta: str, vigentes: pd.DataFrame) -> None:
+    """Borra el incremento o lo reescribe (como CSV) con solo sus filas vigentes."""
+    if vigentes.empty:
+        os.remove(ruta)
+        return
+    destino = os.path.splitext(ruta)[0] + ".csv"
+    with escritura_atomica(destino) as temporal:
+        vigentes.drop(columns=[c for c in COLUMNAS_DERIVADAS if c in vigentes.columns]).to_csv(temporal, index=False)
+    if destino != ruta:
+        os.remove(ruta)
+
+
+def _incrementos_vigentes(ruta_origen: str, base: pd.DataFrame, sha_base: str) -> list:
+    """(huella, delta) de cada archivo de ``incrementos/`` que aplica sobre el Excel base.
+
+    El Excel base manda hasta su FECHA más reciente. Cuando cambia, las filas de los
+    incrementos con esa fecha o anteriores se descartan: los que quedan sin filas se
+    borran y los demás se recortan. Con el mismo Excel base los incrementos se aplican
+    completos, porque se anexaron después de él.
+    """
+    deltas = [(hash_contenido(ruta), ruta, leer_archivo_datos(ruta)) for ruta in archivos_incrementos(ruta_origen)]
+    if not deltas:
+        return []
+    conciliada = _leer_base_conciliada(ruta_origen)
+    limite = base["FECHA"].max()
+    if conciliada not in (None, sha_base) and pd.notna(limite):
+        for i, (sha, ruta, delta) in enumerate(deltas):
+            nuevas = (delta["FECHA"] > limite).to_numpy()
+            if nuevas.all():
+                continue
+            # La huella original se conserva para que volver a anexar el archivo no tenga efecto
+            deltas[i] = (sha, ruta, delta[nuevas])
+            try:
+                _retirar_incremento(ruta, delta[nuevas])
+            except OSError:
+                pass
+    try:
+        with open(os.path.join(directorio_incrementos(ruta_origen), ARCHIVO_BASE_INCREMENTOS), "w", encoding="utf-8") as f:
+            f.write(sha_base)
+    except OSError:
+        pass
+    return [(sha, delta) for sha, _, delta in deltas]
+
+
+def _reconstruir_historial(ruta_origen: str) -> pd.DataFrame:
+    """Lee el Excel, vuelve a aplicar en orden los ``incrementos/`` vigentes y persiste el resultado."""
+    df = leer_archivo_datos(ruta_origen)
+    huella = {**huella_archivo(ruta_origen), "sha256": hash_contenido(ruta_origen)}
+    incrementos = []
+    for sha, delta in _incrementos_vigentes(ruta_origen, df, huella["sha256"]):
+        if len(delta):
+            df = combinar_historial(df, delta)
+        incrementos.append(sha)
+    try:
+        guardar_historial(df, ruta_origen, huella, incrementos)
+    except OSError:
+        # Sin permisos de escritura junto a los datos: se sirve sin caché y no se reintenta
+        # mientras el Excel no cambie
+        _sin_cache[ruta_origen] = (huella["tamano"], huella["mtime"])
+    return df
+
+
+def cargar_historial(ruta_origen: str) -> pd.DataFrame:
+    """Carga el historial desde la caché columnar, reconstruyéndola si el Excel cambió."""
+    if cache_vigente(ruta_origen):
+        return pd.read_parquet(ruta_cache(ruta_origen))
+    return _reconstruir_historial(ruta_origen)
+
+
+def asegurar_cache(ruta_origen: str) -> str:
+    """Garantiza que el Parquet esté vigente sin cargarlo en memoria y devuelve su ruta."""
+    if not cache_vigente(ruta_origen):
+        _reconstruir_historial(ruta_origen)
+    return ruta_cache(ruta_origen)
+
+
+def ruta_arrow(ruta_origen: str) -> str:
+    return os.path.splitext(ruta_origen)[0] + ".arrow"
+
+
+def exportar_arrow(ruta_parquet: str, ruta: str, generacion: str) -> None:
+    """Copia el Parquet a un archivo Arrow IPC sin comprimir, que se puede mapear en memoria."""
+    tabla = pq.read_table(ruta_parquet)
+    tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), CLAVE_GENERACION: generacion.encode()})
+    with escritura_atomica(ruta) as temporal:
+        with pa.OSFile(temporal, "wb") as archivo, ipc.new_file(archivo, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+
+def leer_generacion_arrow(ruta: str) -> str:
+    try:
+        with pa.memory_map(ruta) as mapa:
+            metadatos = ipc.open_file(mapa).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return ""
+    return metadatos.get(CLAVE_GENERACION, b"").decode()
+
+
+def cargar_historial_mapeado(ruta_origen: str) -> pd.DataFrame:
+    """Historial como vistas sobre un archivo Arrow mapeado en memoria, sin copiar los datos.
+
+    Los procesos del mismo host comparten las páginas a través de la caché del sistema
+    operativo. Las columnas son de solo lectura: una escritura en el lugar falla en
+    vez de alterar los datos que ven las demás sesiones.
+    """
+    parquet = asegurar_cache(ruta_origen)
+    generacion = leer_generacion(parquet)
+    if not generacion:
+        # Sin caché escribible junto a los datos no hay nada que mapear
+        return cargar_historial(ruta_origen)
+    ruta = ruta_arrow(ruta_origen)
+    if leer_generacion_arrow(ruta) != generacion:
+        try:
+            exportar_arrow(parquet, ruta, generacion)
+        except OSError:
+            return pd.read_parquet(parquet)
+    try:
+        tabla = ipc.open_file(pa.memory_map(ruta)).read_all()
+    except (OSError, pa.ArrowInvalid):
+        # Archivo ajeno o dañado: se lee el Parquet en vez de mapear
+        return pd.read_parquet(parquet)
+    # split_blocks evita consolidar columnas, así numéricas y fechas conservan el buffer mapeado
+    return tabla.to_pandas(split_blocks=True)
@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import CLAVE_GENERACION, escribir_parquet, generacion_historial, leer_generacion
+from kpi_calculations import COLUMNA_ATRASO, ESTADOS_PAGADOS, mascara_estado, parsear_fecha_hora
+from perfilado import instrumentar
+
+CLAVES_CUBO = ["DIA", "AGENTE DE COBRANZA", "FILA DE COBRANZA", "ESTADO DEL PAGO PROMETIDO"]
+
+
+@instrumentar
+def construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega el historial por día, agente, fila y estado.
+
+    El resultado queda ordenado por DIA, así que los filtros por rango de fechas
+    se resuelven con búsqueda binaria sobre el cubo en lugar de recorrer filas.
+    """
+    atraso = pd.to_numeric(df[COLUMNA_ATRASO], errors="coerce")
+    base = pd.DataFrame({
+        "DIA": parsear_fecha_hora(df["FECHA"]).dt.normalize(),
+        "AGENTE DE COBRANZA": df["AGENTE DE COBRANZA"],
+        "FILA DE COBRANZA": df["FILA DE COBRANZA"],
+        "ESTADO DEL PAGO PROMETIDO": df["ESTADO DEL PAGO PROMETIDO"],
+        "REGISTROS": np.ones(len(df), dtype=np.int64),
+        "CUENTAS": df["CFRNID"].notna().astype(np.int64),
+        "MONTO DE PAGO": pd.to_numeric(df["MONTO DE PAGO"], errors="coerce"),
+        "MONTO DE PAGO PROMETIDO": pd.to_numeric(df["MONTO DE PAGO PROMETIDO"], errors="coerce"),
+        "ATRASO SUMA": atraso.fillna(0),
+        "ATRASO N": atraso.notna().astype(np.int64),
+    })
+    base = base[base["DIA"].notna()]
+    return base.groupby(CLAVES_CUBO, dropna=False, observed=True, sort=True).sum().reset_index()
+
+
+def ruta_cubo(ruta_origen: str) -> str:
+    return os.path.splitext(ruta_origen)[0] + ".cubo.parquet"
+
+
+def guardar_cubo(cubo: pd.DataFrame, ruta_origen: str, generacion: str) -> None:
+    if not generacion:
+        return
+    try:
+        escribir_parquet(cubo, ruta_cubo(ruta_origen), {CLAVE_GENERACION: generacion.encode()})
+    except OSError:
+        pass
+
+
+@instrumentar
+def cargar_cubo_persistido(ruta_origen: str, historial) -> pd.DataFrame:
+    """Lee el cubo guardado si corresponde a la generación actual del historial.
+
+    ``historial`` es el DataFrame o un backend de ``backends`` que sabe construir el cubo.
+    """
+    generacion = generacion_historial(ruta_origen)
+    ruta = ruta_cubo(ruta_origen)
+    if generacion and leer_generacion(ruta) == generacion:
+        return pd.read_parquet(ruta)
+    cubo = historial.cubo() if hasattr(historial, "cubo") else construir_cubo(historial)
+    guardar_cubo(cubo, ruta_origen, generacion)
+    return cubo
+
+
+@instrumentar
+def actualizar_cubo(cubo: pd.DataFrame, historial: pd.DataFrame, dias) -> pd.DataFrame:
+    """Recalcula solo los ``dias`` indicados a partir del historial ya combinado."""
+    dias = pd.DatetimeIndex(pd.to_datetime(dias)).normalize().unique()
+    del_periodo = historial[historial["FECHA"].dt.normalize().isin(dias)]
+    cubo = pd.concat([cubo[~cubo["DIA"].isin(dias)], construir_cubo(del_periodo)], ignore_index=True)
+    # concat pierde el tipo categórico cuando las categorías difieren
+    for col in CLAVES_CUBO[1:]:
+        if isinstance(historial[col].dtype, pd.CategoricalDtype):
+            cubo[col] = cubo[col].astype(historial[col].dtype)
+    return cubo.sort_values(CLAVES_CUBO, ignore_index=True)
+
+
+@instrumentar
+def filtrar_cubo(cubo: pd.DataFrame, fecha_inicio=None, fecha_fin=None, fila=None, agente=None) -> pd.DataFrame:
+    dias = cubo["DIA"].to_numpy()
+    inicio = np.searchsorted(dias, pd.Timestamp(fecha_inicio).to_datetime64(), side="left") if fecha_inicio else 0
+    fin = np.searchsorted(dias, pd.Timestamp(fecha_fin).to_datetime64(), side="right") if fecha_fin else len(cubo)
+    tramo = cubo.iloc[inicio:fin]
+    if fila:
+        tramo = tramo[tramo["FILA DE COBRANZA"] == fila]
+    if agente:
+        tramo = tramo[tramo["AGENTE DE COBRANZA"] == agente]
+    return tramo
+
+
+def _pagados(cubo: pd.DataFrame) -> pd.DataFrame:
+    return cubo[mascara_estado(cubo["ESTADO DEL PAGO PROMETIDO"], ESTADOS_PAGADOS)]
+
+
+@instrumentar
+def monto_por_dia(cubo: pd.DataFrame) -> pd.DataFrame:
+    pagados = _pagados(cubo)
+    return pagados.groupby("DIA")["MONTO DE PAGO"].sum().rename_axis("FECHA").reset_index(name="MONTO TOTAL")
+
+
+@instrumentar
+def pagos_por_agente(cubo: pd.DataFrame, nombre: str, columna: str = "REGISTROS") -> pd.DataFrame:
+    """Cuentas con pago por agente, de mayor a menor.
+
+    ``columna`` es REGISTROS para contar filas o CUENTAS para contar CFRNID no nulos.
+    """
+    conteo = _pagados(cubo).groupby("AGENTE DE COBRANZA", observed=True)[columna].sum()
+    resumen = conteo[conteo > 0].reset_index(name=nombre)
+    return resumen.sort_values(by=nombre, ascending=False).reset_index(drop=True)
+
+
+@instrumentar
+def pagos_por_fila(cubo: pd.DataFrame, nombre: str = "CUENTAS PAGADAS") -> pd.DataFrame:
+    conteo = _pagados(cubo).groupby("FILA DE COBRANZA", observed=True)["REGISTROS"].sum()
+    return conteo[conteo > 0].reset_index(name=nombre)
+
+
+@instrumentar
+def monto_por_estado_y_agente(cubo: pd.DataFrame) -> pd.DataFrame:
+    tabla_estado = cubo.pivot_table(
+        index="AGENTE DE COBRANZA",
+        columns="ESTADO DEL PAGO PROMETIDO",
+        values="MONTO DE PAGO",
+        aggfunc="sum",
+        fill_value=0,
+        observed=True
+    )
+    tabla_estado.columns = tabla_estado.columns.astype(object)
+    tabla_estado = tabla_estado.reset_index()
+    monto_prometido = cubo.groupby("AGENTE DE COBRANZA", observed=True)["MONTO DE PAGO PROMETIDO"].sum().reset_index(name="MONTO PROMETIDO")
+    tabla_estado = pd.merge(monto_prometido, tabla_estado, on="AGENTE DE COBRANZA", how="left")
+    tabla_estado["% CUMPLIMIENTO"] = ((tabla_estado.get("COMPLETO", 0) + tabla_estado.get("PARCIAL", 0)) / tabla_estado["MONTO PROMETIDO"] * 100).round(2)
+    return tabla_estado
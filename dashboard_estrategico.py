@@ -1,41 +1,94 @@
 
+import hashlib
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from carga_datos import compactar_tipos, leer_excel_por_bloques
+from memoizacion import CacheLRU
+from tabla_paginada import mostrar_tabla_paginada
+
+COLUMNAS = {
+    "MONTO DE PAGO PROMETIDO": "MONTO PROMETIDO",
+    "MONTO DE PAGO": "MONTO PAGADO",
+    "AGENTE DE COBRANZA": "AGENTE"
+}
+FILAS_POR_BLOQUE = 10_000
+
 st.set_page_config(page_title="Dashboard Estratégico de Cobranza", layout="wide")
 
 st.title("📊 Dashboard Estratégico de Cobranza")
 
-uploaded_file = st.file_uploader("Sube el archivo Excel de pagos", type=["xlsx"])
-if uploaded_file:
-    df = pd.read_excel(uploaded_file)
 
-    st.success("Archivo cargado correctamente.")
+@st.cache_resource
+def archivos_procesados():
+    # Libros ya parseados, por hash de contenido y compartidos entre sesiones
+    return CacheLRU(int(os.environ.get("DASHBOARD_SUBIDAS", "4")))
 
-    # Renombrar columnas si existen
-    df = df.rename(columns={
-        "MONTO DE PAGO PROMETIDO": "MONTO PROMETIDO",
-        "MONTO DE PAGO": "MONTO PAGADO",
-        "AGENTE DE COBRANZA": "AGENTE"
-    })
 
-    # Asegurar que columnas clave estén presentes
-    total_prometido = df["MONTO PROMETIDO"].sum() if "MONTO PROMETIDO" in df.columns else 0
-    total_pagado = df["MONTO PAGADO"].sum() if "MONTO PAGADO" in df.columns else 0
+def mostrar_resumen(metricas, grafica, total_prometido, total_pagado, pagado_por_agente):
     tasa_cumplimiento = (total_pagado / total_prometido) * 100 if total_prometido > 0 else 0
-
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = metricas.container().columns(3)
     col1.metric("💰 Monto Prometido", f"${total_prometido:,.2f}")
     col2.metric("✅ Monto Pagado", f"${total_pagado:,.2f}")
     col3.metric("📈 Tasa de Cumplimiento", f"{tasa_cumplimiento:.2f}%")
+    if pagado_por_agente is not None:
+        graf = pagado_por_agente.rename("MONTO PAGADO").rename_axis("AGENTE").reset_index()
+        fig = px.bar(graf, x="AGENTE", y="MONTO PAGADO", title="Monto Pagado por Agente")
+        grafica.plotly_chart(fig, use_container_width=True)
+
+
+def parsear_por_bloques(archivo, metricas, grafica) -> pd.DataFrame:
+    """Lee el libro por bloques actualizando progreso, métricas y gráfico a medida que llegan."""
+    progreso = st.progress(0.0, text="Leyendo archivo…")
+    bloques, total_prometido, total_pagado, pagado_por_agente = [], 0.0, 0.0, None
+    for bloque, leidas, total in leer_excel_por_bloques(archivo, FILAS_POR_BLOQUE):
+        bloque = bloque.rename(columns=COLUMNAS)
+        bloques.append(bloque)
+        if "MONTO PROMETIDO" in bloque.columns:
+            total_prometido += bloque["MONTO PROMETIDO"].sum()
+        if "MONTO PAGADO" in bloque.columns:
+            total_pagado += bloque["MONTO PAGADO"].sum()
+            if "AGENTE" in bloque.columns:
+                parcial = bloque.groupby("AGENTE")["MONTO PAGADO"].sum()
+                pagado_por_agente = parcial if pagado_por_agente is None else pagado_por_agente.add(parcial, fill_value=0)
+        mostrar_resumen(metricas, grafica, total_prometido, total_pagado, pagado_por_agente)
+        avance = min(leidas / total, 1.0) if total else 0.0
+        progreso.progress(avance, text=f"Leyendo archivo… {leidas:,} filas")
+    progreso.empty()
+    if not bloques:
+        return pd.DataFrame()
+    # Categóricas para agente, fila y estado: menos memoria y filtros más rápidos en la tabla
+    return compactar_tipos(pd.concat(bloques, ignore_index=True))
+
+
+uploaded_file = st.file_uploader("Sube el archivo Excel de pagos", type=["xlsx"])
+if uploaded_file:
+    huella = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    # Marcadores que se reescriben con cada bloque leído
+    metricas, grafica = st.empty(), st.empty()
+    recien_leido = []
+
+    def leer():
+        recien_leido.append(True)
+        return parsear_por_bloques(uploaded_file, metricas, grafica)
+
+    # Un mismo archivo se parsea una sola vez, aunque se vuelva a subir o cambie un widget
+    df = archivos_procesados().obtener(huella, leer)
+
+    st.success("Archivo cargado correctamente.")
+
+    # Asegurar que columnas clave estén presentes
+    if not recien_leido:
+        total_prometido = df["MONTO PROMETIDO"].sum() if "MONTO PROMETIDO" in df.columns else 0
+        total_pagado = df["MONTO PAGADO"].sum() if "MONTO PAGADO" in df.columns else 0
+        pagado_por_agente = None
+        if "AGENTE" in df.columns and "MONTO PAGADO" in df.columns:
+            pagado_por_agente = df.groupby("AGENTE", observed=True)["MONTO PAGADO"].sum()
+        mostrar_resumen(metricas, grafica, total_prometido, total_pagado, pagado_por_agente)
 
     # Tabla
     st.subheader("📋 Tabla de Datos")
-    st.dataframe(df)
-
-    # Gráfico
-    if "AGENTE" in df.columns and "MONTO PAGADO" in df.columns:
-        graf = df.groupby("AGENTE")["MONTO PAGADO"].sum().reset_index()
-        fig = px.bar(graf, x="AGENTE", y="MONTO PAGADO", title="Monto Pagado por Agente")
-        st.plotly_chart(fig, use_container_width=True)
+    mostrar_tabla_paginada(df, "tabla_datos", columnas_filtro=[c for c in ["AGENTE", "FILA DE COBRANZA", "ESTADO DEL PAGO PROMETIDO"] if c in df.columns])
@@ -0,0 +1,203 @@
+"""Historial repartido en varios archivos (uno por mes) dentro de un directorio.
+
+Cada archivo tiene su propia caché Parquet (ver ``carga_datos``) y ``manifiesto.json``
+guarda el rango de fechas de cada partición, de modo que solo se leen las que se
+solapan con el periodo pedido.
+
+Actualizar el manifiesto y las cachés sin abrir el dashboard:
+    python dataset_particionado.py data/historial --procesos 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from carga_datos import asegurar_cache, compactar_tipos, escritura_atomica, huella_archivo
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+EXTENSIONES = (".xlsx", ".csv")
+
+# Sesiones simultáneas del dashboard pueden indexar a la vez; ver ``_sin_script_principal``
+_candado_principal = threading.Lock()
+
+
+def ruta_manifiesto(directorio: str) -> str:
+    return os.path.join(directorio, NOMBRE_MANIFIESTO)
+
+
+def archivos_particiones(directorio: str) -> list:
+    return sorted(
+        os.path.join(directorio, nombre) for nombre in os.listdir(directorio)
+        if nombre.lower().endswith(EXTENSIONES) and not nombre.startswith(("~$", "."))
+    )
+
+
+def huella_particiones(directorio: str) -> tuple:
+    """Cambia cuando se agrega, quita o modifica alguna partición."""
+    return tuple((os.path.basename(ruta), *huella_archivo(ruta).values()) for ruta in archivos_particiones(directorio))
+
+
+def leer_manifiesto(directorio: str) -> dict:
+    try:
+        with open(ruta_manifiesto(directorio), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_manifiesto(directorio: str, manifiesto: dict) -> None:
+    ruta = ruta_manifiesto(directorio)
+    try:
+        with escritura_atomica(ruta) as temporal, open(temporal, "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    except OSError:
+        pass
+
+
+def _indexar_particion(ruta: str) -> dict:
+    """Construye (si hace falta) la caché de una partición y resume su rango de fechas."""
+    cache = asegurar_cache(ruta)
+    fechas = pq.read_table(cache, columns=["FECHA"]).column(0).to_pandas().dropna()
+    return {
+        **huella_archivo(ruta),
+        "cache": os.path.basename(cache),
+        "filas": pq.read_metadata(cache).num_rows,
+        "fecha_min": fechas.min().isoformat() if len(fechas) else None,
+        "fecha_max": fechas.max().isoformat() if len(fechas) else None,
+    }
+
+
+@contextmanager
+def _sin_script_principal():
+    """Mientras dura, ``__main__`` es este módulo y no el script de Streamlit.
+
+    Con spawn cada proceso hijo vuelve a importar el ``__main__`` del padre, que dentro
+    del servidor es el propio dashboard. Este módulo no ejecuta nada al importarse.
+    El candado evita que otro hilo guarde como original el ``__main__`` ya sustituido
+    y que arranque sus procesos mientras este lo restaura.
+    """
+    with _candado_principal:
+        principal = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = principal
+
+
+def actualizar_manifiesto(directorio: str, procesos: int = None) -> dict:
+    """Reindexa en paralelo solo las particiones nuevas o modificadas."""
+    anterior = leer_manifiesto(directorio)
+    manifiesto, pendientes = {}, []
+    for ruta in archivos_particiones(directorio):
+        nombre = os.path.basename(ruta)
+        entrada = anterior.get(nombre)
+        vigente = (
+            entrada is not None
+            and (entrada["tamano"], entrada["mtime"]) == tuple(huella_archivo(ruta).values())
+            and os.path.exists(os.path.join(directorio, entrada["cache"]))
+        )
+        if vigente:
+            manifiesto[nombre] = entrada
+        else:
+            pendientes.append(ruta)
+
+    if pendientes:
+        # Leer Excel es costoso en CPU: cada partición se procesa en su propio proceso.
+        # spawn y no fork: se llama desde el servidor de Streamlit, que tiene hilos y candados
+        # tomados que un hijo creado con fork heredaría sin poder liberarlos
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(procesos or os.cpu_count(), len(pendientes)), mp_context=contexto) as pool:
+            # Los procesos se crean al enviar las tareas
+            with _sin_script_principal():
+                entradas = pool.map(_indexar_particion, pendientes)
+            for ruta, entrada in zip(pendientes, entradas):
+                manifiesto[os.path.basename(ruta)] = entrada
+    if manifiesto != anterior:
+        _guardar_manifiesto(directorio, manifiesto)
+    return dict(sorted(manifiesto.items()))
+
+
+def rango_manifiesto(manifiesto: dict) -> tuple:
+    minimos = [e["fecha_min"] for e in manifiesto.values() if e["fecha_min"]]
+    maximos = [e["fecha_max"] for e in manifiesto.values() if e["fecha_max"]]
+    if not minimos:
+        return None, None
+    return pd.Timestamp(min(minimos)), pd.Timestamp(max(maximos))
+
+
+def particiones_en_rango(manifiesto: dict, fecha_inicio=None, fecha_fin=None) -> list:
+    """Nombres de las particiones cuyo rango de fechas se solapa con [inicio, fin]."""
+    seleccion = []
+    for nombre, entrada in manifiesto.items():
+        if entrada["fecha_min"] is None:
+            continue
+        if fecha_fin is not None and pd.Timestamp(entrada["fecha_min"]) > pd.Timestamp(fecha_fin):
+            continue
+        if fecha_inicio is not None and pd.Timestamp(entrada["fecha_max"]) < pd.Timestamp(fecha_inicio):
+            continue
+        seleccion.append(nombre)
+    return seleccion
+
+
+def rutas_parquet(directorio: str, manifiesto: dict, nombres: list) -> list:
+    return [os.path.join(directorio, manifiesto[nombre]["cache"]) for nombre in nombres]
+
+
+def filtros_fecha(fecha_inicio=None, fecha_fin=None):
+    """Filtros de pyarrow para recortar las filas al periodo dentro de cada partición."""
+    filtros = []
+    if fecha_inicio is not None:
+        filtros.append(("FECHA", ">=", pd.Timestamp(fecha_inicio)))
+    if fecha_fin is not None:
+        # El fin es inclusivo por día
+        filtros.append(("FECHA", "<", pd.Timestamp(fecha_fin).normalize() + pd.Timedelta(days=1)))
+    return filtros or None
+
+
+def cargar_dataset(directorio: str, fecha_inicio=None, fecha_fin=None, hilos: int = None) -> pd.DataFrame:
+    """Carga solo las particiones que se solapan con el periodo, leyéndolas en paralelo."""
+    manifiesto = actualizar_manifiesto(directorio)
+    rutas = rutas_parquet(directorio, manifiesto, particiones_en_rango(manifiesto, fecha_inicio, fecha_fin))
+    filtros = filtros_fecha(fecha_inicio, fecha_fin)
+    if not rutas:
+        if not manifiesto:
+            return pd.DataFrame()
+        # Ninguna partición cae en el periodo: se devuelve el esquema sin filas
+        return pd.read_parquet(rutas_parquet(directorio, manifiesto, list(manifiesto)[:1])[0]).iloc[:0]
+    # pyarrow libera el GIL al decodificar, así que los hilos leen en paralelo
+    with ThreadPoolExecutor(max_workers=hilos or min(len(rutas), os.cpu_count() or 1)) as pool:
+        partes = list(pool.map(lambda ruta: pd.read_parquet(ruta, filters=filtros), rutas))
+    df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+    # concat pierde el tipo categórico cuando las categorías difieren
+    return compactar_tipos(df)
+
+
+def periodo_reciente(manifiesto: dict, dias: int = None) -> tuple:
+    """Últimos ``dias`` hasta la fecha más reciente del dataset; sin ``dias``, todo el historial."""
+    fecha_min, fecha_max = rango_manifiesto(manifiesto)
+    if fecha_max is None or dias is None:
+        return fecha_min, fecha_max
+    return max(fecha_min, fecha_max.normalize() - pd.Timedelta(days=dias - 1)), fecha_max
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexa las particiones mensuales del historial.")
+    parser.add_argument("directorio", nargs="?", default=os.path.join("data", "historial"))
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+
+    manifiesto = actualizar_manifiesto(args.directorio, args.procesos)
+    for nombre, entrada in manifiesto.items():
+        print(f"{nombre:<30} {entrada['filas']:>10,} filas  {entrada['fecha_min']} → {entrada['fecha_max']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Generador de historiales de pago sintéticos con el esquema del Excel real.
+
+Uso:
+    python datos_sinteticos.py --filas 1000000 --salida sintetico.parquet
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import normalizar_historial
+
+# Proporciones observadas en Historial_Pagos_Prestamos.xlsx
+PROPORCION_ESTADOS = {"PENDIENTE": 0.83, "COMPLETO": 0.15, "PARCIAL": 0.02}
+PROPORCION_FILAS = {"M13+": 0.64, "M5-6": 0.15, "M2": 0.14, "M7-12": 0.07}
+# Rango de días de atraso (inclusive) de cada fila de cobranza
+ATRASO_POR_FILA = {"M2": (31, 60), "M5-6": (121, 180), "M7-12": (181, 365), "M13+": (366, 900)}
+
+
+def generar_historial(
+    filas: int,
+    agentes: int = 115,
+    cuentas: int = None,
+    dias: int = 365,
+    fecha_inicio: str = "2025-01-01",
+    proporcion_estados: dict = None,
+    proporcion_filas: dict = None,
+    monto_mediano: float = 1000.0,
+    semilla: int = 0,
+    normalizar: bool = True,
+) -> pd.DataFrame:
+    """Genera ``filas`` promesas de pago con cardinalidades y distribuciones configurables.
+
+    Con ``normalizar`` el resultado tiene los mismos tipos que produce la carga del Excel.
+    """
+    rng = np.random.default_rng(semilla)
+    proporcion_estados = proporcion_estados or PROPORCION_ESTADOS
+    proporcion_filas = proporcion_filas or PROPORCION_FILAS
+    cuentas = cuentas or max(1, int(filas / 1.03))
+
+    estados = list(proporcion_estados)
+    codigo_estado = rng.choice(len(estados), size=filas, p=_normalizar_pesos(proporcion_estados))
+    nombres_filas = list(proporcion_filas)
+    codigo_fila = rng.choice(len(nombres_filas), size=filas, p=_normalizar_pesos(proporcion_filas))
+
+    # Pocos agentes concentran más promesas que el resto
+    pesos_agentes = rng.pareto(2.0, size=agentes) + 1
+    codigo_agente = rng.choice(agentes, size=filas, p=pesos_agentes / pesos_agentes.sum())
+
+    fecha = pd.Timestamp(fecha_inicio) + pd.to_timedelta(rng.integers(0, dias, size=filas), unit="D")
+    hora_promesa = fecha + pd.to_timedelta(rng.integers(8 * 3600, 20 * 3600, size=filas), unit="s")
+
+    atraso = np.zeros(filas, dtype=np.int64)
+    for i, nombre in enumerate(nombres_filas):
+        minimo, maximo = ATRASO_POR_FILA.get(nombre, (0, 900))
+        en_fila = codigo_fila == i
+        atraso[en_fila] = rng.integers(minimo, maximo + 1, size=en_fila.sum())
+
+    prometido = np.round(rng.lognormal(np.log(monto_mediano), 0.8, size=filas), 2)
+    pago = np.zeros(filas)
+    if "COMPLETO" in estados:
+        completo = codigo_estado == estados.index("COMPLETO")
+        pago[completo] = prometido[completo]
+    if "PARCIAL" in estados:
+        parcial = codigo_estado == estados.index("PARCIAL")
+        pago[parcial] = np.round(prometido[parcial] * rng.uniform(0.1, 0.9, size=parcial.sum()), 2)
+
+    df = pd.DataFrame({
+        "FECHA": fecha.strftime("%Y-%m-%d"),
+        "CFRNID": 360287970190000000 + rng.integers(0, cuentas, size=filas),
+        "AGENTE DE COBRANZA": np.array([f"AGENTE {i:04d}" for i in range(agentes)], dtype=object)[codigo_agente],
+        "FILA DE COBRANZA": np.array(nombres_filas, dtype=object)[codigo_fila],
+        "HORA DE PAGO PROMETIDO": hora_promesa.strftime("%Y-%m-%d %H:%M:%S"),
+        "MONTO DE PAGO PROMETIDO": prometido,
+        "DIAS DE ATRASO EN EL MOMENTO DEL PAGO PROMETIDO": atraso,
+        "ESTADO DEL PAGO PROMETIDO": np.array(estados, dtype=object)[codigo_estado],
+        "MONTO DE PAGO": pago,
+    })
+    return normalizar_historial(df) if normalizar else df
+
+
+def _normalizar_pesos(proporciones: dict) -> np.ndarray:
+    pesos = np.array(list(proporciones.values()), dtype=float)
+    return pesos / pesos.sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un historial de pagos sintético.")
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--agentes", type=int, default=115)
+    parser.add_argument("--cuentas", type=int, default=None)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="sintetico.parquet")
+    args = parser.parse_args()
+
+    df = generar_historial(args.filas, agentes=args.agentes, cuentas=args.cuentas, dias=args.dias, semilla=args.semilla)
+    if args.salida.endswith(".csv"):
+        df.to_csv(args.salida, index=False)
+    else:
+        df.to_parquet(args.salida, index=False)
+    print(f"{len(df)} filas escritas en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
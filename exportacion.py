@@ -0,0 +1,289 @@
+"""Exportación de tablas de KPIs y filas del historial a Parquet, CSV o XLSX.
+
+Las filas llegan por bloques y cada bloque se escribe al archivo antes de pedir el
+siguiente, así que la memoria no depende del tamaño del recorte exportado.
+"""
+import io
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# formato: (extensión, tipo MIME)
+FORMATOS = {
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "CSV": (".csv", "text/csv"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+# Excel admite 1,048,576 filas por hoja; una se usa para el encabezado
+FILAS_POR_HOJA = 1_048_575
+
+_EPOCA_EXCEL = np.datetime64("1899-12-30", "ns")
+_CARACTERES_INVALIDOS = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+
+def _a_tabla(bloque) -> pa.Table:
+    if isinstance(bloque, pd.DataFrame):
+        return pa.Table.from_pandas(bloque, preserve_index=False)
+    if isinstance(bloque, pa.RecordBatch):
+        return pa.Table.from_batches([bloque])
+    return bloque
+
+
+def _a_dataframe(bloque) -> pd.DataFrame:
+    return bloque if isinstance(bloque, pd.DataFrame) else bloque.to_pandas()
+
+
+def _escribir_tablas_arrow(bloques, destino, crear_escritor) -> int:
+    """Escribe los bloques con un escritor de pyarrow; el esquema lo fija el primer bloque."""
+    escritor, esquema, filas = None, None, 0
+    try:
+        for bloque in bloques:
+            tabla = _a_tabla(bloque)
+            if escritor is None:
+                esquema = tabla.schema
+                escritor = crear_escritor(destino, esquema)
+            elif tabla.schema != esquema:
+                tabla = tabla.cast(esquema)
+            escritor.write_table(tabla)
+            filas += tabla.num_rows
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return filas
+
+
+def _texto_csv(tabla: pa.Table) -> pa.Table:
+    # El escritor CSV de pyarrow no acepta columnas de diccionario (categorías)
+    columnas = [
+        col.cast(col.type.value_type) if pa.types.is_dictionary(col.type) else col
+        for col in tabla.columns
+    ]
+    return pa.Table.from_arrays(columnas, names=tabla.column_names)
+
+
+class _EscritorCsv:
+    def __init__(self, destino, esquema: pa.Schema):
+        self._escritor = pacsv.CSVWriter(destino, _texto_csv(esquema.empty_table()).schema)
+
+    def write_table(self, tabla: pa.Table) -> None:
+        self._escritor.write_table(_texto_csv(tabla))
+
+    def close(self) -> None:
+        self._escritor.close()
+
+
+def _celda_texto(serie: pd.Series) -> np.ndarray:
+    texto = serie.astype(str).str.replace(_CARACTERES_INVALIDOS, "", regex=True)
+    texto = texto.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+    return '<c t="inlineStr"><is><t xml:space="preserve">' + texto.to_numpy(dtype=object) + "</t></is></c>"
+
+
+def _celdas(serie: pd.Series) -> np.ndarray:
+    """XML de las celdas de una columna, calculado para toda la columna a la vez; ``<c/>`` si falta el valor."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se escapan las categorías una vez y se reparten por código
+        categorias = _celdas(pd.Series(serie.cat.categories.astype(str)))
+        return np.append(categorias, "<c/>")[serie.cat.codes.to_numpy()]
+    vacias = serie.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valores = serie.dt.tz_localize(None) if getattr(serie.dt, "tz", None) else serie
+        dias = (valores.to_numpy(dtype="datetime64[ns]") - _EPOCA_EXCEL) / np.timedelta64(1, "D")
+        celdas = '<c s="1"><v>' + pd.Series(dias).astype(str).to_numpy(dtype=object) + "</v></c>"
+    elif pd.api.types.is_bool_dtype(serie):
+        celdas = np.where(serie.fillna(False).to_numpy(dtype=bool), '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>')
+    elif pd.api.types.is_integer_dtype(serie):
+        # Excel guarda números de 15 dígitos; identificadores más largos (CFRNID) van como texto
+        if (serie.abs() >= 10**15).any():
+            celdas = _celda_texto(serie)
+        else:
+            celdas = "<c><v>" + serie.astype(str).to_numpy(dtype=object) + "</v></c>"
+    elif pd.api.types.is_numeric_dtype(serie):
+        numeros = serie.to_numpy(dtype=float, na_value=np.nan)
+        vacias = ~np.isfinite(numeros)
+        celdas = "<c><v>" + pd.Series(numeros).astype(str).to_numpy(dtype=object) + "</v></c>"
+    else:
+        celdas = _celda_texto(serie)
+    celdas = np.asarray(celdas, dtype=object)
+    celdas[vacias] = "<c/>"
+    return celdas
+
+
+def _filas_xml(df: pd.DataFrame) -> str:
+    # Sin atributo r: cada celda ocupa la columna siguiente
+    filas = np.full(len(df), "<row>", dtype=object)
+    for columna in df.columns:
+        filas += _celdas(df[columna])
+    return "".join(filas + "</row>")
+
+
+class LibroXlsx:
+    """Escritor de XLSX por bloques: genera el XML de cada bloque con operaciones por columna.
+
+    openpyxl crea un objeto por celda; aquí cada hoja se comprime directo al archivo
+    a medida que llegan los bloques. Los textos van en línea (sin tabla compartida)
+    y las fechas como números de serie con formato de fecha.
+    """
+
+    def __init__(self, destino):
+        self._zip = zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self._hojas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _nombre_hoja(self, nombre: str) -> str:
+        nombre = "".join(c for c in str(nombre) if c not in "[]:*?/\\")[:31] or "Hoja"
+        base, n = nombre, 2
+        while nombre in self._hojas:
+            sufijo = f" ({n})"
+            nombre, n = base[:31 - len(sufijo)] + sufijo, n + 1
+        return nombre
+
+    def agregar_hoja(self, nombre: str, bloques) -> int:
+        """Escribe los bloques en una hoja; al llegar al límite de Excel continúa en otra."""
+        filas, salida, en_hoja = 0, None, 0
+        try:
+            for bloque in bloques:
+                df = _a_dataframe(bloque)
+                if salida is None:
+                    salida = self._abrir_hoja(nombre, df.columns)
+                inicio = 0
+                while inicio < len(df):
+                    if en_hoja == FILAS_POR_HOJA:
+                        self._cerrar_hoja(salida)
+                        salida, en_hoja = self._abrir_hoja(nombre, df.columns), 0
+                    parte = df.iloc[inicio:inicio + FILAS_POR_HOJA - en_hoja]
+                    salida.write(_filas_xml(parte).encode("utf-8"))
+                    inicio += len(parte)
+                    en_hoja += len(parte)
+                filas += len(df)
+        finally:
+            if salida is not None:
+                self._cerrar_hoja(salida)
+        if salida is None:
+            # Sin bloques: hoja vacía para que el libro sea válido
+            self._cerrar_hoja(self._abrir_hoja(nombre, []))
+        return filas
+
+    def _abrir_hoja(self, nombre: str, columnas):
+        self._hojas.append(self._nombre_hoja(nombre))
+        salida = self._zip.open(f"xl/worksheets/sheet{len(self._hojas)}.xml", "w", force_zip64=True)
+        encabezado = "".join(f'<c t="inlineStr"><is><t>{escape(str(c))}</t></is></c>' for c in columnas)
+        salida.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            f"<row>{encabezado}</row>"
+        ).encode("utf-8"))
+        return salida
+
+    @staticmethod
+    def _cerrar_hoja(salida) -> None:
+        salida.write(b"</sheetData></worksheet>")
+        salida.close()
+
+    def close(self) -> None:
+        if self._zip.fp is None:
+            return
+        hojas = range(1, len(self._hojas) + 1)
+        self._zip.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in hojas
+            )
+            + "</Types>"
+        ))
+        self._zip.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ))
+        self._zip.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(
+                f'<sheet name="{escape(nombre, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+                for i, nombre in zip(hojas, self._hojas)
+            )
+            + "</sheets></workbook>"
+        ))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>'
+                for i in hojas
+            )
+            + f'<Relationship Id="rId{len(self._hojas) + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        ))
+        # Estilo 1: formato de fecha y hora integrado (numFmtId 22)
+        self._zip.writestr("xl/styles.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            "</styleSheet>"
+        ))
+        self._zip.close()
+
+
+def exportar_filas(bloques, formato: str, destino, nombre_hoja: str = "Historial") -> int:
+    """Escribe los bloques (DataFrames o lotes de Arrow) en ``destino``; devuelve las filas escritas."""
+    if formato == "Parquet":
+        return _escribir_tablas_arrow(bloques, destino, pq.ParquetWriter)
+    if formato == "CSV":
+        return _escribir_tablas_arrow(bloques, destino, _EscritorCsv)
+    if formato == "Excel":
+        with LibroXlsx(destino) as libro:
+            return libro.agregar_hoja(nombre_hoja, bloques)
+    raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+
+def exportar_tablas(tablas: dict, formato: str, destino) -> None:
+    """Tablas de KPIs: en Excel una hoja por tabla; en CSV o Parquet un ZIP con un archivo por tabla."""
+    if formato == "Excel":
+        with LibroXlsx(destino) as libro:
+            for nombre, tabla in tablas.items():
+                libro.agregar_hoja(nombre, [tabla])
+        return
+    extension = FORMATOS[formato][0]
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as archivo_zip:
+        for nombre, tabla in tablas.items():
+            contenido = io.BytesIO()
+            exportar_filas([tabla], formato, contenido)
+            archivo_zip.writestr(nombre + extension, contenido.getvalue())
+
+
+def archivo_temporal(escribir, *args):
+    """Ejecuta ``escribir(*args, destino)`` sobre un archivo temporal en disco y lo devuelve al inicio.
+
+    El archivo se borra al cerrarse.
+    """
+    destino = tempfile.TemporaryFile()
+    escribir(*args, destino)
+    destino.seek(0)
+    return destino
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from kpi_calculations import COLUMNA_ATRASO, agregar_columnas_derivadas
+from perfilado import instrumentar
+
+COLUMNAS_INDICE = [
+    "CFRNID",
+    "FECHA",
+    "AGENTE DE COBRANZA",
+    "FILA DE COBRANZA",
+    "FECHA_PROMESA",
+    "ESTADO DEL PAGO PROMETIDO",
+    "MONTO DE PAGO PROMETIDO",
+    "MONTO DE PAGO",
+    COLUMNA_ATRASO,
+    "ALTO_RIESGO",
+]
+
+
+class ResumenCuentas:
+    """Resumen por CFRNID ordenado por cuenta, con búsqueda binaria sobre ``cuentas``."""
+
+    def __init__(self, resumen: pd.DataFrame):
+        self.resumen = resumen
+        self.cuentas = resumen.index.to_numpy()
+
+    def _buscar(self, cfrnid) -> int:
+        try:
+            clave = np.asarray(cfrnid, dtype=self.cuentas.dtype)
+        except (TypeError, ValueError, OverflowError):
+            return -1
+        i = int(np.searchsorted(self.cuentas, clave))
+        return i if i < len(self.cuentas) and self.cuentas[i] == clave else -1
+
+    def resumen_cuenta(self, cfrnid):
+        i = self._buscar(cfrnid)
+        return self.resumen.iloc[i] if i >= 0 else None
+
+    def cuentas_alto_riesgo(self, agente: str = None) -> pd.DataFrame:
+        """Cuentas con alguna promesa pendiente de alto riesgo, de mayor a menor atraso."""
+        resumen = self.resumen
+        if resumen.empty:
+            return resumen.reset_index()
+        seleccion = resumen["PROMESAS ALTO RIESGO"].to_numpy() > 0
+        if agente:
+            seleccion &= (resumen["AGENTE DE COBRANZA"] == agente).to_numpy()
+        riesgo = resumen[seleccion].sort_values(["MAX DIAS DE ATRASO", "MONTO PROMETIDO"], ascending=False)
+        return riesgo.reset_index()
+
+
+def categorizar_resumen(resumen: pd.DataFrame) -> pd.DataFrame:
+    for columna in ("AGENTE DE COBRANZA", "FILA DE COBRANZA", "ULTIMO ESTADO"):
+        if not isinstance(resumen[columna].dtype, pd.CategoricalDtype):
+            resumen[columna] = pd.Categorical(resumen[columna])
+    return resumen
+
+
+class IndiceCuentas(ResumenCuentas):
+    """Posiciones de cada CFRNID ordenadas por fecha y un resumen por cuenta.
+
+    Las cuentas quedan en un arreglo ordenado con el inicio y fin de su tramo en
+    ``posiciones``, así que buscar una cuenta es una búsqueda binaria y su
+    historial es un recorte, sin recorrer el DataFrame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if "FECHA_PROMESA" not in df.columns or "ALTO_RIESGO" not in df.columns:
+            df = agregar_columnas_derivadas(df.copy())
+        self.df = df[[col for col in COLUMNAS_INDICE if col in df.columns]]
+
+        con_id = np.flatnonzero(self.df["CFRNID"].notna().to_numpy())
+        cuentas = self.df["CFRNID"].to_numpy()[con_id]
+        fechas = self.df["FECHA"].to_numpy()[con_id]
+        orden = np.lexsort((fechas, cuentas))
+        self.posiciones = con_id[orden]
+        self.cuentas, self.inicios = np.unique(cuentas[orden], return_index=True)
+        self.fines = np.append(self.inicios[1:], len(orden))
+        super().__init__(self._resumir())
+
+    def _resumir(self) -> pd.DataFrame:
+        if not len(self.cuentas):
+            return pd.DataFrame(index=pd.Index(self.cuentas, name="CFRNID"))
+        filas = self.df.iloc[self.posiciones]
+        ultimas = self.df.iloc[self.posiciones[self.fines - 1]]
+
+        def sumar(columna):
+            valores = pd.to_numeric(filas[columna], errors="coerce").to_numpy(dtype=float)
+            return np.add.reduceat(np.nan_to_num(valores), self.inicios)
+
+        atraso = pd.to_numeric(filas[COLUMNA_ATRASO], errors="coerce").to_numpy(dtype=float)
+        resumen = pd.DataFrame({
+            "AGENTE DE COBRANZA": ultimas["AGENTE DE COBRANZA"].array,
+            "FILA DE COBRANZA": ultimas["FILA DE COBRANZA"].array,
+            "REGISTROS": self.fines - self.inicios,
+            "ULTIMA FECHA": ultimas["FECHA"].to_numpy(),
+            "ULTIMA PROMESA": ultimas["FECHA_PROMESA"].to_numpy(),
+            "ULTIMO ESTADO": ultimas["ESTADO DEL PAGO PROMETIDO"].array,
+            "MONTO PROMETIDO": sumar("MONTO DE PAGO PROMETIDO"),
+            "MONTO PAGADO": sumar("MONTO DE PAGO"),
+            # fmax ignora NaN salvo que toda la cuenta carezca del dato
+            "MAX DIAS DE ATRASO": np.fmax.reduceat(atraso, self.inicios),
+            "PROMESAS ALTO RIESGO": np.add.reduceat(filas["ALTO_RIESGO"].to_numpy(dtype=np.int64), self.inicios),
+        }, index=pd.Index(self.cuentas, name="CFRNID"))
+        return categorizar_resumen(resumen)
+
+    def posiciones_cuenta(self, cfrnid) -> np.ndarray:
+        """Posiciones (iloc) de la cuenta en el DataFrame, de la más antigua a la más reciente."""
+        i = self._buscar(cfrnid)
+        return self.posiciones[self.inicios[i]:self.fines[i]] if i >= 0 else self.posiciones[:0]
+
+    def historial_cuenta(self, cfrnid) -> pd.DataFrame:
+        return self.df.iloc[self.posiciones_cuenta(cfrnid)]
+
+
+@instrumentar
+def construir_indice(df: pd.DataFrame) -> IndiceCuentas:
+    return IndiceCuentas(df)
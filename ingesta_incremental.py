@@ -0,0 +1,69 @@
+import argparse
+import os
+import shutil
+
+from carga_datos import (
+    archivos_incrementos,
+    cargar_historial,
+    combinar_historial,
+    directorio_incrementos,
+    guardar_historial,
+    hash_contenido,
+    leer_archivo_datos,
+    leer_metadatos,
+    ruta_cache,
+)
+from cubo_diario import actualizar_cubo, cargar_cubo_persistido, guardar_cubo
+
+
+def anexar_delta(ruta_origen: str, ruta_delta: str) -> dict:
+    """Integra un archivo de registros nuevos al historial persistido.
+
+    El delta se copia a ``incrementos/`` para que se vuelva a aplicar si el Excel
+    base se reemplaza, y del cubo diario solo se recalculan los días que contiene.
+    """
+    historial = cargar_historial(ruta_origen)
+    metadatos = leer_metadatos(ruta_cache(ruta_origen))
+    if metadatos is None:
+        raise RuntimeError(f"No se pudo persistir el historial junto a {ruta_origen}")
+
+    sha = hash_contenido(ruta_delta)
+    if sha in metadatos["incrementos"]:
+        return {"aplicado": False, "filas_delta": 0, "filas_total": len(historial), "dias_actualizados": 0}
+
+    cubo = cargar_cubo_persistido(ruta_origen, historial)
+    delta = leer_archivo_datos(ruta_delta)
+    historial = combinar_historial(historial, delta)
+
+    os.makedirs(directorio_incrementos(ruta_origen), exist_ok=True)
+    # Los incrementos ya cubiertos por un Excel base nuevo se borran: se sigue la numeración más alta
+    prefijos = [os.path.basename(ruta).split("_", 1)[0] for ruta in archivos_incrementos(ruta_origen)]
+    consecutivo = max((int(p) for p in prefijos if p.isdigit()), default=0) + 1
+    destino = os.path.join(directorio_incrementos(ruta_origen), f"{consecutivo:05d}_{os.path.basename(ruta_delta)}")
+    shutil.copy2(ruta_delta, destino)
+
+    huella = {clave: metadatos[clave] for clave in ("tamano", "mtime", "sha256")}
+    generacion = guardar_historial(historial, ruta_origen, huella, metadatos["incrementos"] + [sha])
+
+    dias = delta["FECHA"].dropna().dt.normalize().unique()
+    guardar_cubo(actualizar_cubo(cubo, historial, dias), ruta_origen, generacion)
+    return {"aplicado": True, "filas_delta": len(delta), "filas_total": len(historial), "dias_actualizados": len(dias)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anexa registros nuevos al historial de pagos.")
+    parser.add_argument("deltas", nargs="+", help="Archivos .xlsx o .csv con los registros nuevos")
+    parser.add_argument("--origen", default=os.path.join("data", "Historial_Pagos_Prestamos.xlsx"))
+    args = parser.parse_args()
+
+    for ruta_delta in args.deltas:
+        resumen = anexar_delta(args.origen, ruta_delta)
+        if resumen["aplicado"]:
+            print(f"{ruta_delta}: {resumen['filas_delta']} filas, {resumen['dias_actualizados']} días recalculados, "
+                  f"{resumen['filas_total']} filas en total")
+        else:
+            print(f"{ruta_delta}: ya aplicado, se omite")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,152 +1,258 @@
-
+import numpy as np
 import pandas as pd
 
-def calcular_efectividad_por_agente(df: pd.DataFrame) -> pd.DataFrame:
-    tabla = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-    resultado = tabla.groupby("AGENTE DE COBRANZA")["CFRNID"].count().reset_index(name="CUENTAS EFECTIVAS")
-    return resultado
-
-def monto_prometido_vs_pagado(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["MONTO COMPLETO"] = df[df["ESTADO DEL PAGO PROMETIDO"] == "COMPLETO"]["MONTO DE PAGO"]
-    df["MONTO PARCIAL"] = df[df["ESTADO DEL PAGO PROMETIDO"] == "PARCIAL"]["MONTO DE PAGO"]
-    df["MONTO SIN PAGO"] = df[df["ESTADO DEL PAGO PROMETIDO"] == "PENDIENTE"]["MONTO DE PAGO"]
-    resumen = df.groupby("AGENTE DE COBRANZA").agg({
-        "MONTO DE PAGO PROMETIDO": "sum",
-        "MONTO COMPLETO": "sum",
-        "MONTO PARCIAL": "sum",
-        "MONTO SIN PAGO": "sum"
-    }).fillna(0)
+from perfilado import instrumentar
+
+ESTADOS_PAGADOS = ["COMPLETO", "PARCIAL"]
+ESTADOS_VALIDOS = ["COMPLETO", "PARCIAL", "PENDIENTE"]
+COLUMNA_ATRASO = "DIAS DE ATRASO EN EL MOMENTO DEL PAGO PROMETIDO"
+FORMATO_HORA_PROMESA = "%Y-%m-%d %H:%M:%S"
+DIAS_ALTO_RIESGO = 90
+
+# Columnas calculadas una vez al cargar el historial (ver ``agregar_columnas_derivadas``)
+COLUMNAS_DERIVADAS = ["FECHA_PROMESA", "DIAS_PROMESA_A_PAGO", "ES_PAGADO", "ES_PENDIENTE", "ALTO_RIESGO"]
+
+
+def mascara_estado(estado: pd.Series, valores) -> np.ndarray:
+    """Máscara de filas cuyo estado está en ``valores``.
+
+    Si la columna es categórica se comparan los códigos enteros en lugar de cadenas.
+    """
+    if isinstance(estado.dtype, pd.CategoricalDtype):
+        codigos = estado.cat.categories.get_indexer(list(valores))
+        return np.isin(estado.cat.codes.to_numpy(), codigos[codigos >= 0])
+    return estado.isin(valores).to_numpy()
+
+
+def parsear_fecha_hora(valores: pd.Series, formato: str = FORMATO_HORA_PROMESA) -> pd.Series:
+    """Convierte a datetime con formato explícito; solo lo que no encaja pasa por ISO8601."""
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        return valores
+    fechas = pd.to_datetime(valores, format=formato, errors="coerce")
+    restantes = fechas.isna() & valores.notna()
+    if restantes.any():
+        fechas[restantes] = pd.to_datetime(valores[restantes], format="ISO8601", errors="coerce")
+    return fechas
+
+
+def columnas_derivadas(df: pd.DataFrame) -> dict:
+    """Fecha de promesa, días de la promesa al pago y banderas de estado del historial."""
+    estado = df["ESTADO DEL PAGO PROMETIDO"]
+    pendiente = mascara_estado(estado, ["PENDIENTE"])
+    fecha_promesa = parsear_fecha_hora(df["HORA DE PAGO PROMETIDO"])
+    atraso = pd.to_numeric(df[COLUMNA_ATRASO], errors="coerce").to_numpy(dtype=float)
+    return {
+        "FECHA_PROMESA": fecha_promesa,
+        # Días enteros (NaN sin fecha); float32 los representa sin pérdida
+        "DIAS_PROMESA_A_PAGO": (parsear_fecha_hora(df["FECHA"]) - fecha_promesa).dt.days.astype(np.float32),
+        "ES_PAGADO": mascara_estado(estado, ESTADOS_PAGADOS),
+        "ES_PENDIENTE": pendiente,
+        "ALTO_RIESGO": pendiente & (atraso >= DIAS_ALTO_RIESGO) & df["CFRNID"].notna().to_numpy(),
+    }
+
+
+def agregar_columnas_derivadas(df: pd.DataFrame) -> pd.DataFrame:
+    for nombre, valores in columnas_derivadas(df).items():
+        df[nombre] = valores
+    return df
+
+
+def _derivadas(df: pd.DataFrame) -> dict:
+    """Columnas derivadas del DataFrame; se calculan al vuelo si no vienen de la carga."""
+    if all(col in df.columns for col in COLUMNAS_DERIVADAS):
+        return {col: df[col] for col in COLUMNAS_DERIVADAS}
+    return columnas_derivadas(df)
+
+
+@instrumentar
+def compute_agent_kpis(df: pd.DataFrame, mascara=None, por_dia: bool = False) -> pd.DataFrame:
+    """Sumas por agente de todos los indicadores, en una sola agrupación.
+
+    Cada columna es aditiva (conteos y sumas), de modo que los KPIs por agente
+    se derivan del resultado sin volver a recorrer ni copiar el DataFrame. Con
+    ``por_dia`` se agrupa por agente y DIA, la base de los KPIs móviles.
+    """
+    derivadas = _derivadas(df)
+    estado = df["ESTADO DEL PAGO PROMETIDO"]
+    completo = mascara_estado(estado, ["COMPLETO"])
+    parcial = mascara_estado(estado, ["PARCIAL"])
+    pendiente = np.asarray(derivadas["ES_PENDIENTE"], dtype=bool)
+    pagado = np.asarray(derivadas["ES_PAGADO"], dtype=bool)
+    con_id = df["CFRNID"].notna().to_numpy()
+
+    prometido = pd.to_numeric(df["MONTO DE PAGO PROMETIDO"], errors="coerce").to_numpy(dtype=float)
+    pago = pd.to_numeric(df["MONTO DE PAGO"], errors="coerce").to_numpy(dtype=float)
+    dias = np.asarray(derivadas["DIAS_PROMESA_A_PAGO"], dtype=float)
+    con_dias = ~np.isnan(dias)
+    liquidada = pagado & (prometido > 0)
+
+    indicadores = pd.DataFrame({
+        "MONTO PROMETIDO": prometido,
+        "MONTO COMPLETO": np.where(completo, pago, 0.0),
+        "MONTO PARCIAL": np.where(parcial, pago, 0.0),
+        "MONTO SIN PAGO": np.where(pendiente, pago, 0.0),
+        "PAGADAS": pagado.astype(np.int64),
+        "PAGADAS CON ID": (pagado & con_id).astype(np.int64),
+        "PENDIENTES": pendiente.astype(np.int64),
+        "ALTO RIESGO": np.asarray(derivadas["ALTO_RIESGO"], dtype=np.int64),
+        "PAGOS TARDIOS": (pagado & (dias > 0)).astype(np.int64),
+        "DIAS PAGADAS SUMA": np.where(pagado & con_dias, dias, 0.0),
+        "DIAS PAGADAS N": (pagado & con_dias).astype(np.int64),
+        "LIQUIDADAS": liquidada.astype(np.int64),
+        "LIQUIDADAS PROMETIDO": np.where(liquidada, prometido, 0.0),
+        "LIQUIDADAS PAGADO": np.where(liquidada, pago, 0.0),
+        "DIAS LIQUIDADAS SUMA": np.where(liquidada & con_dias, dias, 0.0),
+        "DIAS LIQUIDADAS N": (liquidada & con_dias).astype(np.int64),
+    })
+    claves = [df["AGENTE DE COBRANZA"].reset_index(drop=True)]
+    if por_dia:
+        claves.append(parsear_fecha_hora(df["FECHA"]).dt.normalize().rename("DIA").reset_index(drop=True))
+    if mascara is not None:
+        mascara = np.asarray(mascara, dtype=bool)
+        indicadores = indicadores[mascara]
+        claves = [clave[mascara] for clave in claves]
+
+    return indicadores.groupby(claves, sort=True, observed=True).sum()
+
+
+def _kpis(df: pd.DataFrame, kpis) -> pd.DataFrame:
+    return compute_agent_kpis(df) if kpis is None else kpis
+
+
+@instrumentar
+def calcular_efectividad_por_agente(df: pd.DataFrame, kpis=None) -> pd.DataFrame:
+    kpis = _kpis(df, kpis)
+    efectividad = kpis.loc[kpis["PAGADAS"] > 0, "PAGADAS"].reset_index(name="CUENTAS CON PAGO")
+    efectividad = efectividad.sort_values(by="CUENTAS CON PAGO", ascending=False)
+    return efectividad
+
+
+@instrumentar
+def monto_prometido_vs_pagado(df: pd.DataFrame, kpis=None) -> pd.DataFrame:
+    kpis = _kpis(df, kpis)
+    resumen = kpis[["MONTO PROMETIDO", "MONTO COMPLETO", "MONTO PARCIAL", "MONTO SIN PAGO"]].rename(
+        columns={"MONTO PROMETIDO": "MONTO DE PAGO PROMETIDO"}
+    )
     resumen["% CUMPLIMIENTO"] = ((resumen["MONTO COMPLETO"] + resumen["MONTO PARCIAL"]) / resumen["MONTO DE PAGO PROMETIDO"]) * 100
     return resumen.reset_index()
 
-def distribucion_estado_pago(df: pd.DataFrame) -> pd.DataFrame:
-    return df["ESTADO DEL PAGO PROMETIDO"].value_counts(normalize=True).reset_index().rename(columns={
+
+@instrumentar
+def conteo_estados(df: pd.DataFrame) -> pd.Series:
+    """Registros por estado del pago; aditivo entre subconjuntos del historial."""
+    return df["ESTADO DEL PAGO PROMETIDO"].value_counts()
+
+
+@instrumentar
+def distribucion_estado_pago(df: pd.DataFrame, conteos=None) -> pd.DataFrame:
+    conteos = conteo_estados(df) if conteos is None else conteos
+    proporcion = (conteos / conteos.sum()).rename("proportion").rename_axis("ESTADO DEL PAGO PROMETIDO")
+    return proporcion.sort_values(ascending=False, kind="stable").reset_index().rename(columns={
         "index": "Estado",
         "ESTADO DEL PAGO PROMETIDO": "% del Total"
     })
 
-def monto_total_por_dia(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["FECHA"] = pd.to_datetime(df["FECHA"], errors="coerce")
-    df = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-    df["MONTO SUMADO"] = df["MONTO DE PAGO"]
-    return df.groupby("FECHA")["MONTO SUMADO"].sum().reset_index(name="MONTO TOTAL")
-
-def cuentas_alto_riesgo(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df = df[(df["ESTADO DEL PAGO PROMETIDO"] == "PENDIENTE") & (df["DIAS DE ATRASO EN EL MOMENTO DEL PAGO PROMETIDO"] >= 90)]
-    return df.groupby("AGENTE DE COBRANZA")["CFRNID"].count().reset_index(name="CUENTAS DE ALTO RIESGO")
-
-def indicadores_dso_rr_sr(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["FECHA_PROMESA"] = pd.to_datetime(df["HORA DE PAGO PROMETIDO"], errors="coerce")
-    df["FECHA_REAL"] = pd.to_datetime(df["FECHA"], errors="coerce")
-    df_pagados = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])].copy()
-    df_pagados = df_pagados[df_pagados["MONTO DE PAGO PROMETIDO"] > 0]
-    df_pagados["DIAS_DSO"] = (df_pagados["FECHA_REAL"] - df_pagados["FECHA_PROMESA"]).dt.days
-    resumen = df_pagados.groupby("AGENTE DE COBRANZA").agg({
-        "MONTO DE PAGO PROMETIDO": "sum",
-        "MONTO DE PAGO": "sum",
-        "DIAS_DSO": "mean",
-        "ESTADO DEL PAGO PROMETIDO": "count"
-    }).rename(columns={
-        "MONTO DE PAGO PROMETIDO": "PROMETIDO",
-        "MONTO DE PAGO": "PAGADO",
-        "DIAS_DSO": "DSO",
-        "ESTADO DEL PAGO PROMETIDO": "PROMESAS LIQUIDADAS"
+
+@instrumentar
+def monto_pagado_por_dia(df: pd.DataFrame) -> pd.Series:
+    """Monto pagado (completo o parcial) por FECHA; aditivo entre subconjuntos del historial."""
+    pagados = np.asarray(_derivadas(df)["ES_PAGADO"], dtype=bool)
+    fechas = parsear_fecha_hora(df.loc[pagados, "FECHA"])
+    return df.loc[pagados, "MONTO DE PAGO"].groupby(fechas).sum().rename_axis("FECHA")
+
+
+@instrumentar
+def monto_total_por_dia(df: pd.DataFrame, montos=None) -> pd.DataFrame:
+    montos = monto_pagado_por_dia(df) if montos is None else montos
+    return montos.rename_axis("FECHA").reset_index(name="MONTO TOTAL")
+
+
+@instrumentar
+def cuentas_alto_riesgo(df: pd.DataFrame, kpis=None) -> pd.DataFrame:
+    kpis = _kpis(df, kpis)
+    return kpis.loc[kpis["ALTO RIESGO"] > 0, "ALTO RIESGO"].reset_index(name="CUENTAS DE ALTO RIESGO")
+
+
+@instrumentar
+def indicadores_dso_rr_sr(df: pd.DataFrame, kpis=None) -> pd.DataFrame:
+    kpis = _kpis(df, kpis)
+    kpis = kpis[kpis["LIQUIDADAS"] > 0]
+    resumen = pd.DataFrame({
+        "PROMETIDO": kpis["LIQUIDADAS PROMETIDO"],
+        "PAGADO": kpis["LIQUIDADAS PAGADO"],
+        "DSO": kpis["DIAS LIQUIDADAS SUMA"] / kpis["DIAS LIQUIDADAS N"].replace(0, np.nan),
+        "PROMESAS LIQUIDADAS": kpis["LIQUIDADAS"],
     })
     resumen["RECOVERY RATE (%)"] = (resumen["PAGADO"] / resumen["PROMETIDO"]) * 100
     resumen["SETTLEMENT RATE (%)"] = (resumen["PROMESAS LIQUIDADAS"] / resumen["PROMESAS LIQUIDADAS"].sum()) * 100
     return resumen.reset_index()
 
-def indicadores_lpr_acp(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["FECHA_PROMESA"] = pd.to_datetime(df["HORA DE PAGO PROMETIDO"], errors="coerce")
-    df["FECHA_REAL"] = pd.to_datetime(df["FECHA"], errors="coerce")
-    df_pagados = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])].copy()
-    df_pagados["DIAS_REALES"] = (df_pagados["FECHA_REAL"] - df_pagados["FECHA_PROMESA"]).dt.days
-    df_pagados["PAGO_TARDIO"] = df_pagados["DIAS_REALES"] > 0
-    resumen = df_pagados.groupby("AGENTE DE COBRANZA").agg({
-        "DIAS_REALES": "mean",
-        "PAGO_TARDIO": "mean",
-        "ESTADO DEL PAGO PROMETIDO": "count"
-    }).rename(columns={
-        "DIAS_REALES": "ACP",
-        "PAGO_TARDIO": "LPR (%)",
-        "ESTADO DEL PAGO PROMETIDO": "PAGOS"
+
+@instrumentar
+def indicadores_lpr_acp(df: pd.DataFrame, kpis=None) -> pd.DataFrame:
+    kpis = _kpis(df, kpis)
+    kpis = kpis[kpis["PAGADAS"] > 0]
+    resumen = pd.DataFrame({
+        "ACP": kpis["DIAS PAGADAS SUMA"] / kpis["DIAS PAGADAS N"].replace(0, np.nan),
+        "LPR (%)": kpis["PAGOS TARDIOS"] / kpis["PAGADAS"] * 100,
+        "PAGOS": kpis["PAGADAS"],
     })
-    resumen["LPR (%)"] = resumen["LPR (%)"] * 100
     return resumen.reset_index()
 
-def indicadores_nsr_rr(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df_validas = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL", "PENDIENTE"])].copy()
-    df_validas["PROMESA EXITOSA"] = df_validas["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])
-    df_validas["PROMESA FALLIDA"] = df_validas["ESTADO DEL PAGO PROMETIDO"] == "PENDIENTE"
-    resumen = df_validas.groupby("AGENTE DE COBRANZA").agg({
-        "ESTADO DEL PAGO PROMETIDO": "count",
-        "PROMESA EXITOSA": "sum",
-        "PROMESA FALLIDA": "sum"
-    }).rename(columns={
-        "ESTADO DEL PAGO PROMETIDO": "TOTAL PROMESAS",
-        "PROMESA EXITOSA": "CUMPLIDAS",
-        "PROMESA FALLIDA": "RECHAZADAS"
+
+@instrumentar
+def indicadores_nsr_rr(df: pd.DataFrame, kpis=None) -> pd.DataFrame:
+    kpis = _kpis(df, kpis)
+    resumen = pd.DataFrame({
+        "TOTAL PROMESAS": kpis["PAGADAS"] + kpis["PENDIENTES"],
+        "CUMPLIDAS": kpis["PAGADAS"],
+        "RECHAZADAS": kpis["PENDIENTES"],
     })
+    resumen = resumen[resumen["TOTAL PROMESAS"] > 0]
     resumen["NSR (%)"] = (resumen["CUMPLIDAS"] / resumen["TOTAL PROMESAS"]) * 100
     resumen["RR (%)"] = (resumen["RECHAZADAS"] / resumen["TOTAL PROMESAS"]) * 100
     return resumen.reset_index()
 
-def atraso_por_fila_y_estado(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL", "PENDIENTE"])]
-    df["DIAS DE ATRASO"] = pd.to_numeric(df["DIAS DE ATRASO EN EL MOMENTO DEL PAGO PROMETIDO"], errors="coerce").fillna(0)
-    agrupado = df.groupby(["FILA DE COBRANZA", "ESTADO DEL PAGO PROMETIDO"]).agg({
-        "DIAS DE ATRASO": "mean",
-        "CFRNID": "count"
-    }).reset_index()
-    agrupado.rename(columns={
-        "DIAS DE ATRASO": "PROMEDIO DIAS DE ATRASO",
-        "CFRNID": "TOTAL CASOS"
-    }, inplace=True)
-    return agrupado
-
 
-def productividad_por_agente(df: pd.DataFrame, fecha_inicio=None, fecha_fin=None, fila=None) -> pd.DataFrame:
-    df = df.copy()
-    df["FECHA"] = pd.to_datetime(df["FECHA"], errors="coerce")
+@instrumentar
+def sumas_atraso(df: pd.DataFrame) -> pd.DataFrame:
+    """Suma de días de atraso, filas y casos con CFRNID por fila y estado; columnas aditivas."""
+    validas = mascara_estado(df["ESTADO DEL PAGO PROMETIDO"], ESTADOS_VALIDOS)
+    return pd.DataFrame({
+        "DIAS SUMA": pd.to_numeric(df.loc[validas, COLUMNA_ATRASO], errors="coerce").fillna(0),
+        "FILAS": 1,
+        "CASOS": df.loc[validas, "CFRNID"].notna().astype("int64"),
+    }).groupby([df.loc[validas, "FILA DE COBRANZA"], df.loc[validas, "ESTADO DEL PAGO PROMETIDO"]], observed=True).sum()
 
-    if fecha_inicio and fecha_fin:
-        df = df[(df["FECHA"] >= fecha_inicio) & (df["FECHA"] <= fecha_fin)]
 
-    if fila:
-        df = df[df["FILA DE COBRANZA"] == fila]
+@instrumentar
+def atraso_por_fila_y_estado(df: pd.DataFrame, sumas=None) -> pd.DataFrame:
+    sumas = sumas_atraso(df) if sumas is None else sumas
+    return pd.DataFrame({
+        "PROMEDIO DIAS DE ATRASO": sumas["DIAS SUMA"] / sumas["FILAS"],
+        "TOTAL CASOS": sumas["CASOS"],
+    }).reset_index()
 
-    df = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-    resumen = df.groupby("AGENTE DE COBRANZA")["CFRNID"].count().reset_index(name="CUENTAS PAGADAS")
-    resumen = resumen.sort_values("CUENTAS PAGADAS", ascending=False)
-    return resumen
 
+@instrumentar
+def productividad_por_agente(df: pd.DataFrame, fecha_inicio=None, fecha_fin=None, fila=None, kpis=None) -> pd.DataFrame:
+    """Cuentas pagadas con CFRNID por agente; con ``kpis`` se deriva de esas sumas sin filtrar."""
+    if kpis is not None:
+        return _productividad(kpis)
+    mascara = np.ones(len(df), dtype=bool)
+    if fecha_inicio or fecha_fin:
+        fechas = parsear_fecha_hora(df["FECHA"])
+        if fecha_inicio:
+            mascara &= (fechas >= pd.to_datetime(fecha_inicio)).to_numpy()
+        if fecha_fin:
+            mascara &= (fechas <= pd.to_datetime(fecha_fin)).to_numpy()
+    if fila:
+        mascara &= (df["FILA DE COBRANZA"] == fila).to_numpy()
 
-def productividad_por_agente(df: pd.DataFrame, fecha_inicio=None, fecha_fin=None, fila=None) -> pd.DataFrame:
-    df = df.copy()
-    df["FECHA"] = pd.to_datetime(df["FECHA"], errors="coerce")
+    return _productividad(compute_agent_kpis(df, mascara))
 
-    if fecha_inicio:
-        df = df[df["FECHA"] >= pd.to_datetime(fecha_inicio)]
-    if fecha_fin:
-        df = df[df["FECHA"] <= pd.to_datetime(fecha_fin)]
-    if fila:
-        df = df[df["FILA DE COBRANZA"] == fila]
 
-    df = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-    
-    resumen = df.groupby("AGENTE DE COBRANZA")["CFRNID"].count().reset_index(name="CUENTAS CON PAGO")
+def _productividad(kpis: pd.DataFrame) -> pd.DataFrame:
+    resumen = kpis.loc[kpis["PAGADAS CON ID"] > 0, "PAGADAS CON ID"].reset_index(name="CUENTAS CON PAGO")
     resumen = resumen.sort_values(by="CUENTAS CON PAGO", ascending=False).reset_index(drop=True)
     return resumen
-
-def calcular_efectividad_por_agente(df):
-    df_filtrado = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-    efectividad = df_filtrado.groupby("AGENTE DE COBRANZA").size().reset_index(name="CUENTAS CON PAGO")
-    efectividad = efectividad.sort_values(by="CUENTAS CON PAGO", ascending=False)
-    return efectividad
\ No newline at end of file
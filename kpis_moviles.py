@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from perfilado import instrumentar
+
+VENTANAS = (7, 30, 90)
+COLUMNAS_MOVILES = ["LIQUIDADAS PROMETIDO", "LIQUIDADAS PAGADO", "PAGADAS", "PENDIENTES", "PAGOS TARDIOS"]
+INDICADORES_MOVILES = ["RECOVERY RATE (%)", "NSR (%)", "LPR (%)"]
+
+
+def _porcentaje(numerador: np.ndarray, denominador: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominador > 0, numerador / denominador * 100, np.nan)
+
+
+@instrumentar
+def kpis_moviles(diario: pd.DataFrame, ventanas=VENTANAS) -> pd.DataFrame:
+    """Recovery rate, NSR y LPR por agente en ventanas de ``ventanas`` días que terminan cada día.
+
+    ``diario`` son las sumas por agente y DIA de ``compute_agent_kpis(df, por_dia=True)``.
+    La serie diaria se lleva a una matriz densa agentes × días y se acumula una
+    vez; la suma de cualquier ventana es la diferencia de dos sumas acumuladas,
+    así que el costo no depende del número ni del tamaño de las ventanas. Las
+    primeras ventanas de cada serie abarcan los días disponibles hasta ese momento.
+    """
+    columnas = ["AGENTE DE COBRANZA", "FECHA", "VENTANA"] + INDICADORES_MOVILES
+    if diario.empty:
+        return pd.DataFrame(columns=columnas)
+
+    agentes_fila = diario.index.get_level_values(0)
+    dias_fila = pd.DatetimeIndex(diario.index.get_level_values(1))
+    codigos, agentes = pd.factorize(agentes_fila, sort=True)
+    dias = pd.date_range(dias_fila.min(), dias_fila.max(), freq="D")
+    posiciones = (dias_fila - dias[0]).days.to_numpy()
+
+    # Fila 0 en ceros para que la ventana que empieza en el primer día reste nada
+    acumulado = np.zeros((len(agentes), len(dias) + 1, len(COLUMNAS_MOVILES)))
+    acumulado[codigos, posiciones + 1] = diario[COLUMNAS_MOVILES].to_numpy(dtype=float)
+    acumulado = acumulado.cumsum(axis=1)
+
+    fin = np.arange(1, len(dias) + 1)
+    partes = []
+    for ventana in ventanas:
+        inicio = np.maximum(fin - ventana, 0)
+        suma = acumulado[:, fin, :] - acumulado[:, inicio, :]
+        prometido, pagado, pagadas, pendientes, tardios = (suma[..., i] for i in range(len(COLUMNAS_MOVILES)))
+        partes.append(pd.DataFrame({
+            "AGENTE DE COBRANZA": np.repeat(np.asarray(agentes), len(dias)),
+            "FECHA": np.tile(dias, len(agentes)),
+            "VENTANA": ventana,
+            "RECOVERY RATE (%)": _porcentaje(pagado, prometido).ravel(),
+            "NSR (%)": _porcentaje(pagadas, pagadas + pendientes).ravel(),
+            "LPR (%)": _porcentaje(tardios, pagadas).ravel(),
+        }))
+    return pd.concat(partes, ignore_index=True)[columnas]
@@ -1,327 +1,655 @@
 
 import streamlit as st
 import pandas as pd
+import altair as alt
 import os
 import sys
 
 # Asegurar que el módulo utils se pueda importar
 sys.path.append(os.path.join(os.path.dirname(__file__), "utils"))
 from kpi_calculations import (
-    productividad_por_agente,
-    atraso_por_fila_y_estado,
-
     indicadores_nsr_rr,
     indicadores_lpr_acp,
     indicadores_dso_rr_sr,
     calcular_efectividad_por_agente,
     monto_prometido_vs_pagado,
+    cuentas_alto_riesgo,
+    COLUMNAS_DERIVADAS,
+    DIAS_ALTO_RIESGO
+)
+from backends import (
+    SIN_FILTROS,
+    Filtros,
+    atraso_por_fila_y_estado,
+    crear_backend,
     distribucion_estado_pago,
-    monto_total_por_dia,
-    cuentas_alto_riesgo
+    kpis_agentes
 )
+from carga_datos import asegurar_cache, cargar_historial, cargar_historial_mapeado, huella_dataset
+from cubo_diario import (
+    cargar_cubo_persistido,
+    filtrar_cubo,
+    monto_por_dia,
+    pagos_por_agente,
+    pagos_por_fila,
+    monto_por_estado_y_agente
+)
+from dataset_particionado import (
+    actualizar_manifiesto,
+    cargar_dataset,
+    huella_particiones,
+    particiones_en_rango,
+    periodo_reciente,
+    rutas_parquet
+)
+from exportacion import FORMATOS, archivo_temporal, exportar_filas, exportar_tablas
+from kpis_moviles import INDICADORES_MOVILES, VENTANAS, kpis_moviles
+from series_temporales import FRECUENCIAS, PUNTOS_MAXIMOS, frecuencia_para_rango, reducir_puntos, remuestrear
+from perfilado import fragmento, historial_recargas, iniciar_recarga, mostrar_panel, perfilado_solicitado, seccion
+from memoizacion import cache_kpis, marcar_huella, memoizar
+from tabla_paginada import mostrar_tabla_paginada
 
 # Configuración general
 st.set_page_config(page_title="Dashboard de Cobranza", layout="wide")
 st.title("📊 Dashboard de Cobranza - KPIs Iniciales")
 
+# Panel de rendimiento opcional (DASHBOARD_PERF=1 o ?perf=1)
+recarga = iniciar_recarga(perfilado_solicitado(st.query_params), sesion=st.session_state)
+
+# KPIs memoizados entre sesiones por huella del dataset y filtros
+kpis_agentes = memoizar(kpis_agentes)
+calcular_efectividad_por_agente = memoizar(calcular_efectividad_por_agente)
+monto_prometido_vs_pagado = memoizar(monto_prometido_vs_pagado)
+cuentas_alto_riesgo = memoizar(cuentas_alto_riesgo)
+distribucion_estado_pago = memoizar(distribucion_estado_pago)
+indicadores_dso_rr_sr = memoizar(indicadores_dso_rr_sr)
+indicadores_lpr_acp = memoizar(indicadores_lpr_acp)
+indicadores_nsr_rr = memoizar(indicadores_nsr_rr)
+atraso_por_fila_y_estado = memoizar(atraso_por_fila_y_estado)
+filtrar_cubo = memoizar(filtrar_cubo)
+monto_por_dia = memoizar(monto_por_dia)
+pagos_por_agente = memoizar(pagos_por_agente)
+pagos_por_fila = memoizar(pagos_por_fila)
+remuestrear = memoizar(remuestrear)
+reducir_puntos = memoizar(reducir_puntos)
+kpis_moviles = memoizar(kpis_moviles)
+monto_por_estado_y_agente = memoizar(monto_por_estado_y_agente)
+
 # Cargar datos
 excel_path = os.path.join("data", "Historial_Pagos_Prestamos.xlsx")
+# Si existe, un directorio con un archivo por mes reemplaza al Excel único
+directorio_dataset = os.environ.get("DASHBOARD_DATASET", os.path.join("data", "historial"))
+particionado = os.path.isdir(directorio_dataset)
+# pandas carga el historial en memoria; duckdb consulta el Parquet sin cargarlo
+nombre_backend = os.environ.get("DASHBOARD_BACKEND", "pandas").lower()
+# Una sola copia de solo lectura del historial para todas las sesiones (DASHBOARD_COMPARTIDO=0 lo desactiva)
+compartido = os.environ.get("DASHBOARD_COMPARTIDO", "1").lower() not in ("0", "false", "no")
+PERIODOS_CARGA = {"Últimos 30 días": 30, "Últimos 90 días": 90, "Último año": 365, "Todo el historial": None}
+# Versiones del historial que se conservan en caché: una por periodo, o la actual y la anterior
+# mientras las sesiones abiertas pasan a la nueva generación tras una ingesta
+VERSIONES_EN_CACHE = len(PERIODOS_CARGA) if particionado else 2
 
 @st.cache_data
-def cargar_datos():
-    return pd.read_excel(excel_path)
-
-df = cargar_datos()
-df["FECHA"] = pd.to_datetime(df["FECHA"], errors="coerce")
+def indexar_dataset(huella):
+    return actualizar_manifiesto(directorio_dataset)
+
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def cargar_datos(huella, periodo=None):
+    # La huella (generación del Parquet) invalida la caché cuando cambia el archivo o se anexan incrementos
+    if particionado:
+        return cargar_dataset(directorio_dataset, *periodo)
+    return cargar_historial(excel_path)
+
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def obtener_backend(nombre, huella, periodo=None):
+    # Las cachés de KPIs usan la huella como clave, no el backend, así no retienen datasets reemplazados
+    return marcar_huella(construir_backend(nombre, huella, periodo), f"backend:{nombre}:{huella}:{periodo}")
+
+def construir_backend(nombre, huella, periodo=None):
+    if nombre == "duckdb" and particionado:
+        manifiesto = indexar_dataset(huella)
+        rutas = rutas_parquet(directorio_dataset, manifiesto, particiones_en_rango(manifiesto, *periodo))
+        # Sin particiones en el periodo basta una para conocer el esquema; el recorte deja la vista vacía
+        rutas = rutas or rutas_parquet(directorio_dataset, manifiesto, list(manifiesto)[:1])
+        return crear_backend(nombre, rutas, fecha_inicio=periodo[0], fecha_fin=periodo[1])
+    if nombre == "duckdb":
+        return crear_backend(nombre, asegurar_cache(excel_path))
+    if compartido:
+        # Sin pasar por cache_data, que deserializa una copia por sesión en cada recarga
+        df = cargar_dataset(directorio_dataset, *periodo) if particionado else cargar_historial_mapeado(excel_path)
+        return crear_backend(nombre, df=marcar_huella(df, f"historial:{huella}:{periodo}"))
+    return crear_backend(nombre, df=marcar_huella(cargar_datos(huella, periodo), f"historial:{huella}:{periodo}"))
+
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def cargar_cubo(nombre, huella, periodo=None):
+    # Agregado diario para los filtros por rango de fechas
+    backend = obtener_backend(nombre, huella, periodo)
+    return backend.cubo() if particionado else cargar_cubo_persistido(excel_path, backend)
+
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def obtener_indice(nombre, huella, periodo=None):
+    # Resumen por CFRNID; una sola copia por dataset para todas las sesiones
+    return obtener_backend(nombre, huella, periodo).indice_cuentas()
+
+with seccion("Carga de datos"):
+    periodo = None
+    if particionado:
+        huella_datos = huella_particiones(directorio_dataset)
+        # Solo se leen las particiones mensuales que se solapan con el periodo elegido
+        nombre_periodo = st.sidebar.selectbox("🗂️ Periodo cargado", list(PERIODOS_CARGA), key="periodo_carga")
+        inicio_periodo, fin_periodo = periodo_reciente(indexar_dataset(huella_datos), PERIODOS_CARGA[nombre_periodo])
+        periodo = (inicio_periodo.date(), fin_periodo.date()) if inicio_periodo is not None else (None, None)
+        st.sidebar.caption(f"Datos del {periodo[0]} al {periodo[1]}")
+    else:
+        huella_datos = huella_dataset(excel_path)
+    backend = obtener_backend(nombre_backend, huella_datos, periodo)
+    # cache_data entrega una copia nueva en cada recarga; la marca vale para ese objeto
+    cubo = marcar_huella(cargar_cubo(nombre_backend, huella_datos, periodo), f"cubo:{huella_datos}:{periodo}")
+
+fecha_min = cubo["DIA"].min()
+fecha_max = cubo["DIA"].max()
+filas_cobranza = sorted(cubo["FILA DE COBRANZA"].dropna().unique().tolist())
+agentes_cobranza = sorted(cubo["AGENTE DE COBRANZA"].dropna().unique().tolist())
+# Columnas del archivo; las derivadas solo existen para calcular los KPIs
+columnas_archivo = [c for c in backend.columnas() if c not in COLUMNAS_DERIVADAS]
 
 # Mostrar columnas disponibles
-st.subheader("🔍 Columnas encontradas en el archivo:")
-st.write(df.columns.tolist())
+def mostrar_columnas():
+    with seccion("Columnas"):
+        st.subheader("🔍 Columnas encontradas en el archivo:")
+        st.write(columnas_archivo)
+
 
 # Vista general
-st.subheader("📋 Vista general de los datos")
-st.dataframe(df, use_container_width=True)
+@fragmento
+def mostrar_vista_general():
+    with seccion("Vista general"):
+        st.subheader("📋 Vista general de los datos")
+        mostrar_tabla_paginada(backend, "vista_general", columnas=columnas_archivo)
+
 
 # KPI 1: Efectividad de Cobranza por Agente
-st.subheader("✅ Efectividad de Cobranza por Agente")
-efectividad = calcular_efectividad_por_agente(df)
-if "Error" in efectividad.columns:
-    st.error(f"❌ Error: {efectividad['Error'][0]}")
-else:
-    st.dataframe(efectividad, use_container_width=True)
-    st.bar_chart(efectividad.set_index("AGENTE DE COBRANZA"))
+def mostrar_efectividad():
+    with seccion("Efectividad por agente"):
+        st.subheader("✅ Efectividad de Cobranza por Agente")
+        efectividad = calcular_efectividad_por_agente(None, kpis_agentes(backend))
+        if "Error" in efectividad.columns:
+            st.error(f"❌ Error: {efectividad['Error'][0]}")
+        else:
+            st.dataframe(efectividad, use_container_width=True)
+            st.bar_chart(efectividad.set_index("AGENTE DE COBRANZA"))
+
 
 # KPI 2: Monto Prometido vs Pagado por Estado del Pago
-st.subheader("💰 Monto Prometido vs Pagado por Estado del Pago")
-monto_cmp_total = monto_prometido_vs_pagado(df)
-if "Error" in monto_cmp_total.columns:
-    st.error(f"❌ Error: {monto_cmp_total['Error'][0]}")
-else:
-    st.dataframe(monto_cmp_total, use_container_width=True)
+def mostrar_monto_prometido_vs_pagado():
+    with seccion("Monto prometido vs pagado"):
+        st.subheader("💰 Monto Prometido vs Pagado por Estado del Pago")
+        monto_cmp_total = monto_prometido_vs_pagado(None, kpis_agentes(backend))
+        if "Error" in monto_cmp_total.columns:
+            st.error(f"❌ Error: {monto_cmp_total['Error'][0]}")
+        else:
+            st.dataframe(monto_cmp_total, use_container_width=True)
+
 
 # KPI 3: Monto Total Recuperado por Día (Completo + Parcial)
-st.subheader("📈 Monto Total Recuperado por Día")
-fecha_min = df["FECHA"].min()
-fecha_max = df["FECHA"].max()
-fecha_ini, fecha_fin = st.date_input("📅 Rango para monto diario:", [fecha_min, fecha_max], key="filtro_monto_dia")
-df_diario_filtrado = df[(df["FECHA"] >= pd.to_datetime(fecha_ini)) & (df["FECHA"] <= pd.to_datetime(fecha_fin))]
-monto_diario = monto_total_por_dia(df_diario_filtrado)
-
-if "Error" in monto_diario.columns:
-    st.error(f"❌ Error: {monto_diario['Error'][0]}")
-else:
-    st.dataframe(monto_diario, use_container_width=True)
-    st.line_chart(monto_diario.set_index("FECHA"))
+@fragmento
+def mostrar_monto_por_dia():
+    with seccion("Monto recuperado por día"):
+        st.subheader("📈 Monto Total Recuperado por Día")
+        col_rango, col_agrupacion, col_puntos = st.columns([2, 1, 1])
+        fecha_ini, fecha_fin = col_rango.date_input("📅 Rango para monto diario:", [fecha_min, fecha_max], key="filtro_monto_dia")
+        agrupacion = col_agrupacion.selectbox("Agrupación", ["Automática"] + [f[2] for f in FRECUENCIAS], key="agrupacion_monto_dia")
+        reducir = col_puntos.checkbox(f"Reducir a {PUNTOS_MAXIMOS} puntos (LTTB)", value=True, key="lttb_monto_dia")
+
+        # Se parte de los totales diarios del cubo; el tamaño del gráfico no depende del rango
+        monto_diario = monto_por_dia(filtrar_cubo(cubo, fecha_ini, fecha_fin))
+        if agrupacion == "Automática":
+            frecuencia, agrupacion = frecuencia_para_rango(fecha_ini, fecha_fin)
+        else:
+            frecuencia = next(f[1] for f in FRECUENCIAS if f[2] == agrupacion)
+        monto_periodo = remuestrear(monto_diario, frecuencia)
+        if reducir:
+            monto_periodo = reducir_puntos(monto_periodo, PUNTOS_MAXIMOS)
+
+        if "Error" in monto_diario.columns:
+            st.error(f"❌ Error: {monto_diario['Error'][0]}")
+        else:
+            st.caption(f"Agrupación {agrupacion.lower()}: {len(monto_periodo):,} puntos de {len(monto_diario):,} días con pagos")
+            st.dataframe(monto_periodo, use_container_width=True)
+            st.line_chart(monto_periodo.set_index("FECHA"))
+
+
+# KPIs móviles por agente: ventanas de 7, 30 y 90 días sobre sumas diarias acumuladas
+@fragmento
+def mostrar_kpis_moviles():
+    with seccion("KPIs móviles por agente"):
+        st.subheader("📉 Recovery Rate, NSR y LPR Móviles por Agente")
+        moviles = kpis_moviles(kpis_agentes(backend, SIN_FILTROS, True))
+
+        col_indicador, col_ventana, col_agentes = st.columns([1, 1, 3])
+        indicador = col_indicador.selectbox("Indicador", INDICADORES_MOVILES, key="indicador_movil")
+        ventana = col_ventana.radio("Ventana (días)", VENTANAS, horizontal=True, key="ventana_movil")
+        # Por defecto, los cinco agentes con más pagos
+        principales = kpis_agentes(backend)["PAGADAS"].nlargest(5).index.astype(str).tolist()
+        agentes = col_agentes.multiselect("Agentes", agentes_cobranza, default=principales, key="agentes_movil")
+
+        serie = moviles[(moviles["VENTANA"] == ventana) & moviles["AGENTE DE COBRANZA"].isin(agentes)]
+        if serie.empty:
+            st.info("Selecciona al menos un agente con datos en el periodo.")
+        else:
+            grafica = alt.Chart(serie).mark_line().encode(
+                x=alt.X("FECHA:T", title="Fecha"),
+                y=alt.Y(field=indicador, type="quantitative", title=indicador),
+                color=alt.Color("AGENTE DE COBRANZA:N", title="Agente"),
+                tooltip=["AGENTE DE COBRANZA", "FECHA", alt.Tooltip(field=indicador, type="quantitative", format=".2f")]
+            )
+            st.altair_chart(grafica, use_container_width=True)
+            st.dataframe(serie.pivot(index="FECHA", columns="AGENTE DE COBRANZA", values=indicador), use_container_width=True)
+
 
 # KPI 4: Cuentas de Alto Riesgo por Agente
-st.subheader("🚨 Cuentas de Alto Riesgo por Agente")
-alto_riesgo = cuentas_alto_riesgo(df)
-if "Error" in alto_riesgo.columns:
-    st.error(f"❌ Error: {alto_riesgo['Error'][0]}")
-else:
-    st.dataframe(alto_riesgo, use_container_width=True)
-    st.bar_chart(alto_riesgo.set_index("AGENTE DE COBRANZA"))
+def mostrar_alto_riesgo():
+    with seccion("Cuentas de alto riesgo"):
+        st.subheader("🚨 Cuentas de Alto Riesgo por Agente")
+        alto_riesgo = cuentas_alto_riesgo(None, kpis_agentes(backend))
+        if "Error" in alto_riesgo.columns:
+            st.error(f"❌ Error: {alto_riesgo['Error'][0]}")
+        else:
+            st.dataframe(alto_riesgo, use_container_width=True)
+            st.bar_chart(alto_riesgo.set_index("AGENTE DE COBRANZA"))
+
 
 # KPI 5: Distribución del Estado del Pago Prometido
-st.subheader("📊 Distribución del Estado del Pago Prometido")
-estado_pago = distribucion_estado_pago(df)
-if "Error" in estado_pago.columns:
-    st.error(f"❌ Error: {estado_pago['Error'][0]}")
-else:
-    estado_pago.columns = ["Estado", "% del Total"]
-    st.dataframe(estado_pago, use_container_width=True)
-    st.bar_chart(data=estado_pago.set_index("Estado"))
+def mostrar_distribucion_estado():
+    with seccion("Distribución del estado del pago"):
+        st.subheader("📊 Distribución del Estado del Pago Prometido")
+        estado_pago = distribucion_estado_pago(backend)
+        if "Error" in estado_pago.columns:
+            st.error(f"❌ Error: {estado_pago['Error'][0]}")
+        else:
+            estado_pago.columns = ["Estado", "% del Total"]
+            st.dataframe(estado_pago, use_container_width=True)
+            st.bar_chart(data=estado_pago.set_index("Estado"))
+
 
 # KPI adicional: DSO, Recovery Rate y Settlement Rate
-st.subheader("📉 DSO, Recovery Rate y Settlement Rate por Agente")
-kpi_dso_rr_sr_df = indicadores_dso_rr_sr(df)
+def mostrar_dso_rr_sr():
+    with seccion("DSO, RR y SR"):
+        st.subheader("📉 DSO, Recovery Rate y Settlement Rate por Agente")
+        kpi_dso_rr_sr_df = indicadores_dso_rr_sr(None, kpis_agentes(backend))
+
+        if "Error" in kpi_dso_rr_sr_df.columns:
+            st.error(f"❌ Error: {kpi_dso_rr_sr_df['Error'][0]}")
+        else:
+            st.dataframe(kpi_dso_rr_sr_df, use_container_width=True)
+            st.bar_chart(kpi_dso_rr_sr_df.set_index("AGENTE DE COBRANZA")[["DSO", "RECOVERY RATE (%)", "SETTLEMENT RATE (%)"]])
 
-if "Error" in kpi_dso_rr_sr_df.columns:
-    st.error(f"❌ Error: {kpi_dso_rr_sr_df['Error'][0]}")
-else:
-    st.dataframe(kpi_dso_rr_sr_df, use_container_width=True)
-    st.bar_chart(kpi_dso_rr_sr_df.set_index("AGENTE DE COBRANZA")[["DSO", "RECOVERY RATE (%)", "SETTLEMENT RATE (%)"]])
 
 # KPI adicional: LPR y ACP
-st.subheader("⏱️ Late Payment Rate (LPR) y Average Collection Period (ACP)")
-kpi_lpr_acp_df = indicadores_lpr_acp(df)
+def mostrar_lpr_acp():
+    with seccion("LPR y ACP"):
+        st.subheader("⏱️ Late Payment Rate (LPR) y Average Collection Period (ACP)")
+        kpi_lpr_acp_df = indicadores_lpr_acp(None, kpis_agentes(backend))
+
+        if "Error" in kpi_lpr_acp_df.columns:
+            st.error(f"❌ Error: {kpi_lpr_acp_df['Error'][0]}")
+        else:
+            st.dataframe(kpi_lpr_acp_df, use_container_width=True)
+            st.bar_chart(kpi_lpr_acp_df.set_index("AGENTE DE COBRANZA")[["LPR (%)", "ACP"]])
 
-if "Error" in kpi_lpr_acp_df.columns:
-    st.error(f"❌ Error: {kpi_lpr_acp_df['Error'][0]}")
-else:
-    st.dataframe(kpi_lpr_acp_df, use_container_width=True)
-    st.bar_chart(kpi_lpr_acp_df.set_index("AGENTE DE COBRANZA")[["LPR (%)", "ACP"]])
 
 # KPI adicional: Negotiation Success Rate y Rejection Rate
-st.subheader("🤝 Negotiation Success Rate (NSR) y Rejection Rate (RR)")
-kpi_nsr_rr_df = indicadores_nsr_rr(df)
+def mostrar_nsr_rr():
+    with seccion("NSR y RR"):
+        st.subheader("🤝 Negotiation Success Rate (NSR) y Rejection Rate (RR)")
+        kpi_nsr_rr_df = indicadores_nsr_rr(None, kpis_agentes(backend))
+
+        if "Error" in kpi_nsr_rr_df.columns:
+            st.error(f"❌ Error: {kpi_nsr_rr_df['Error'][0]}")
+        else:
+            st.dataframe(kpi_nsr_rr_df, use_container_width=True)
+            st.bar_chart(kpi_nsr_rr_df.set_index("AGENTE DE COBRANZA")[["NSR (%)", "RR (%)"]])
 
-if "Error" in kpi_nsr_rr_df.columns:
-    st.error(f"❌ Error: {kpi_nsr_rr_df['Error'][0]}")
-else:
-    st.dataframe(kpi_nsr_rr_df, use_container_width=True)
-    st.bar_chart(kpi_nsr_rr_df.set_index("AGENTE DE COBRANZA")[["NSR (%)", "RR (%)"]])
 
 # KPI adicional: Análisis por fila de cobranza y estado de pago
-st.subheader("⏱️ Análisis de atraso y cumplimiento por fila de cobranza")
-lpr_acp_filas = atraso_por_fila_y_estado(df)
+def mostrar_atraso_por_fila():
+    with seccion("Atraso por fila y estado"):
+        st.subheader("⏱️ Análisis de atraso y cumplimiento por fila de cobranza")
+        lpr_acp_filas = atraso_por_fila_y_estado(backend)
+
+        if "Error" in lpr_acp_filas.columns:
+            st.error(f"❌ Error: {lpr_acp_filas['Error'][0]}")
+        else:
+            st.dataframe(lpr_acp_filas, use_container_width=True)
 
-if "Error" in lpr_acp_filas.columns:
-    st.error(f"❌ Error: {lpr_acp_filas['Error'][0]}")
-else:
-    st.dataframe(lpr_acp_filas, use_container_width=True)
 
 # KPI adicional: Promedio de días de atraso y total de casos por fila y estado
-st.subheader("📊 Promedio de días de atraso y cantidad de casos por fila y estado del pago")
-df_atraso_fila_estado = atraso_por_fila_y_estado(df)
+def mostrar_promedio_atraso():
+    with seccion("Promedio de atraso por fila y estado"):
+        st.subheader("📊 Promedio de días de atraso y cantidad de casos por fila y estado del pago")
+        df_atraso_fila_estado = atraso_por_fila_y_estado(backend)
+
+        if "Error" in df_atraso_fila_estado.columns:
+            st.error(f"❌ Error: {df_atraso_fila_estado['Error'][0]}")
+        else:
+            st.dataframe(df_atraso_fila_estado, use_container_width=True)
 
-if "Error" in df_atraso_fila_estado.columns:
-    st.error(f"❌ Error: {df_atraso_fila_estado['Error'][0]}")
-else:
-    st.dataframe(df_atraso_fila_estado, use_container_width=True)
 
 # KPI: Promedio de días de atraso y cantidad de casos por fila de cobranza y estado del pago
-st.subheader("📌 Promedio de Días de Atraso por Fila de Cobranza y Estado del Pago")
-df_kpi_final = atraso_por_fila_y_estado(df)
+def mostrar_promedio_atraso_detalle():
+    with seccion("Promedio de atraso por fila y estado (detalle)"):
+        st.subheader("📌 Promedio de Días de Atraso por Fila de Cobranza y Estado del Pago")
+        df_kpi_final = atraso_por_fila_y_estado(backend)
+
+        if "Error" in df_kpi_final.columns:
+            st.error(f"❌ Error: {df_kpi_final['Error'][0]}")
+        else:
+            st.dataframe(df_kpi_final, use_container_width=True)
 
-if "Error" in df_kpi_final.columns:
-    st.error(f"❌ Error: {df_kpi_final['Error'][0]}")
-else:
-    st.dataframe(df_kpi_final, use_container_width=True)
 
 # 🏆 Productividad por agente (filtrada por fecha y fila)
-st.subheader("🏆 Productividad por Agente de Cobranza (Con filtros)")
-
-with st.expander("📆 Filtros para productividad"):
-    col1, col2 = st.columns(2)
-    fecha_inicio_prod = col1.date_input("Desde", df["FECHA"].min().date())
-    fecha_fin_prod = col2.date_input("Hasta", df["FECHA"].max().date())
-    fila_seleccion_prod = st.selectbox("Selecciona la fila de cobranza", options=["Todos"] + sorted(df["FILA DE COBRANZA"].dropna().unique().tolist()))
-
-if fila_seleccion_prod != "Todos":
-    df_productividad = productividad_por_agente(df, fecha_inicio_prod, fecha_fin_prod, fila_seleccion_prod)
-else:
-    df_productividad = productividad_por_agente(df, fecha_inicio_prod, fecha_fin_prod)
-
-st.dataframe(df_productividad, use_container_width=True)
-
-# Gráfico de barras horizontal
-if not df_productividad.empty:
-    try:
-        import altair as alt
-        graf_prod = alt.Chart(df_productividad).mark_bar(size=30).encode(
-            y=alt.Y("CUENTAS CON PAGO:Q", title="Cuentas Pagadas", scale=alt.Scale(zero=True, nice=True)),
-            x=alt.X("AGENTE DE COBRANZA:N", sort="-y", title="Agente de Cobranza"),
-            tooltip=["AGENTE DE COBRANZA", "CUENTAS CON PAGO"]
-        ).properties(width=900, height=500)
-
-        texto = alt.Chart(df_productividad).mark_text(
-            align="center",
-            baseline="bottom",
-            dy=-5
-        ).encode(
-            x=alt.X("AGENTE DE COBRANZA:N", sort="-y"),
-            y="CUENTAS CON PAGO:Q",
-            text=alt.Text("CUENTAS CON PAGO:Q")
+@fragmento
+def mostrar_productividad_por_agente():
+    with seccion("Productividad por agente"):
+        st.subheader("🏆 Productividad por Agente de Cobranza (Con filtros)")
+
+        with st.expander("📆 Filtros para productividad"):
+            col1, col2 = st.columns(2)
+            fecha_inicio_prod = col1.date_input("Desde", fecha_min.date())
+            fecha_fin_prod = col2.date_input("Hasta", fecha_max.date())
+            fila_seleccion_prod = st.selectbox("Selecciona la fila de cobranza", options=["Todos"] + filas_cobranza)
+
+        cubo_productividad = filtrar_cubo(
+            cubo, fecha_inicio_prod, fecha_fin_prod,
+            fila=fila_seleccion_prod if fila_seleccion_prod != "Todos" else None
         )
+        df_productividad = pagos_por_agente(cubo_productividad, "CUENTAS CON PAGO", columna="CUENTAS")
+
+        st.dataframe(df_productividad, use_container_width=True)
+
+        # Gráfico de barras horizontal
+        if not df_productividad.empty:
+            try:
+                graf_prod = alt.Chart(df_productividad).mark_bar(size=30).encode(
+                    y=alt.Y("CUENTAS CON PAGO:Q", title="Cuentas Pagadas", scale=alt.Scale(zero=True, nice=True)),
+                    x=alt.X("AGENTE DE COBRANZA:N", sort="-y", title="Agente de Cobranza"),
+                    tooltip=["AGENTE DE COBRANZA", "CUENTAS CON PAGO"]
+                ).properties(width=900, height=500)
+
+                texto = alt.Chart(df_productividad).mark_text(
+                    align="center",
+                    baseline="bottom",
+                    dy=-5
+                ).encode(
+                    x=alt.X("AGENTE DE COBRANZA:N", sort="-y"),
+                    y="CUENTAS CON PAGO:Q",
+                    text=alt.Text("CUENTAS CON PAGO:Q")
+                )
+
+                st.altair_chart(graf_prod + texto, use_container_width=True)
+            except Exception as e:
+                st.warning(f"No se pudo renderizar la gráfica de productividad: {e}")
+            except Exception as e:
+                st.warning(f"No se pudo renderizar la gráfica de productividad: {e}")
+            except Exception as e:
+                st.warning(f"No se pudo renderizar la gráfica de productividad: {e}")
+
+
+def mostrar_productividad_por_fila():
+    with seccion("Productividad por fila"):
+        st.subheader("🏢 Productividad por Fila de Cobranza")
+
+        try:
+            df_filas_grouped = pagos_por_fila(cubo)
+
+            graf_fila = alt.Chart(df_filas_grouped).mark_bar(size=30).encode(
+                y=alt.Y("CUENTAS PAGADAS:Q", title="Cuentas Pagadas"),
+                x=alt.X("FILA DE COBRANZA:N", sort="-y", title="Fila de Cobranza"),
+                tooltip=["FILA DE COBRANZA", "CUENTAS PAGADAS"]
+            ).properties(width=700, height=400)
+
+            etiquetas_fila = alt.Chart(df_filas_grouped).mark_text(
+                align="center", baseline="bottom", dy=-5
+            ).encode(
+                x=alt.X("FILA DE COBRANZA:N", sort="-y"),
+                y="CUENTAS PAGADAS:Q",
+                text="CUENTAS PAGADAS:Q"
+            )
+
+            st.altair_chart(graf_fila + etiquetas_fila, use_container_width=True)
+        except Exception as e:
+            st.warning(f"No se pudo mostrar la gráfica por fila de cobranza: {e}")
+
+
+@fragmento
+def mostrar_comparativo_por_agente():
+    with seccion("Comparativo por agente"):
+        st.subheader("📊 Comparativo de Cumplimiento y Productividad por Agente")
+
+        # Filtro por fecha
+        fecha_inicio, fecha_fin = st.date_input("Selecciona el rango de fechas:", [fecha_min, fecha_max])
+
+        cubo_fecha = filtrar_cubo(cubo, fecha_inicio, fecha_fin)
+
+
+        # Filtro adicional por agente de cobranza
+        agentes_disponibles = sorted(cubo_fecha["AGENTE DE COBRANZA"].dropna().unique())
+        agente_seleccionado = st.selectbox("Selecciona un agente de cobranza:", ["Todos"] + agentes_disponibles)
+
+        if agente_seleccionado != "Todos":
+            cubo_fecha = filtrar_cubo(cubo_fecha, agente=agente_seleccionado)
+
+
+        # KPIs de cumplimiento por estado
+        tabla_estado = monto_por_estado_y_agente(cubo_fecha)
+
+        st.markdown("### 💰 Monto Prometido vs Pagado por Estado del Pago")
+        st.dataframe(tabla_estado)
+
+        # Productividad por agente
+        tabla_productividad = pagos_por_agente(cubo_fecha, "CUENTAS PAGADAS")
+
+        st.markdown("### 🏆 Productividad por Agente de Cobranza")
+        st.dataframe(tabla_productividad)
+
+        # Gráfica: Monto prometido vs pagado por estado (por agente)
+        try:
+            df_plot_estado = tabla_estado.copy()
+            df_plot_estado = df_plot_estado.fillna(0)
+            df_plot_estado = df_plot_estado.melt(
+                id_vars=["AGENTE DE COBRANZA"],
+                value_vars=["COMPLETO", "PARCIAL", "PENDIENTE"],
+                var_name="ESTADO DEL PAGO",
+                value_name="MONTO"
+            )
+
+            chart_estado = alt.Chart(df_plot_estado).mark_bar().encode(
+                x=alt.X("AGENTE DE COBRANZA:N", sort="-y", title="Agente de Cobranza"),
+                y=alt.Y("MONTO:Q", title="Monto"),
+                color="ESTADO DEL PAGO:N",
+                tooltip=["AGENTE DE COBRANZA", "ESTADO DEL PAGO", "MONTO"]
+            ).properties(width=800, height=400).configure_axisX(labelAngle=-45)
+
+            st.altair_chart(chart_estado, use_container_width=True)
+        except Exception as e:
+            st.warning(f"No se pudo generar la gráfica de montos por estado: {e}")
+
+        # Gráfica: Productividad (cuentas con pago)
+        try:
+            chart_productividad = alt.Chart(tabla_productividad).mark_bar(size=20).encode(
+                x=alt.X("AGENTE DE COBRANZA:N", sort="-y"),
+                y=alt.Y("CUENTAS PAGADAS:Q", title="Cuentas con Pago"),
+                tooltip=["AGENTE DE COBRANZA", "CUENTAS PAGADAS"]
+            ).properties(width=800, height=400).configure_axisX(labelAngle=-45)
+
+            st.altair_chart(chart_productividad, use_container_width=True)
+        except Exception as e:
+            st.warning(f"No se pudo generar la gráfica de productividad: {e}")
 
-        st.altair_chart(graf_prod + texto, use_container_width=True)
-    except Exception as e:
-        st.warning(f"No se pudo renderizar la gráfica de productividad: {e}")
-    except Exception as e:
-        st.warning(f"No se pudo renderizar la gráfica de productividad: {e}")
-    except Exception as e:
-        st.warning(f"No se pudo renderizar la gráfica de productividad: {e}")
-
-
-st.subheader("🏢 Productividad por Fila de Cobranza")
-
-try:
-    df_filas = df[df["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-    df_filas_grouped = df_filas.groupby("FILA DE COBRANZA").size().reset_index(name="CUENTAS PAGADAS")
-
-    graf_fila = alt.Chart(df_filas_grouped).mark_bar(size=30).encode(
-        y=alt.Y("CUENTAS PAGADAS:Q", title="Cuentas Pagadas"),
-        x=alt.X("FILA DE COBRANZA:N", sort="-y", title="Fila de Cobranza"),
-        tooltip=["FILA DE COBRANZA", "CUENTAS PAGADAS"]
-    ).properties(width=700, height=400)
-
-    etiquetas_fila = alt.Chart(df_filas_grouped).mark_text(
-        align="center", baseline="bottom", dy=-5
-    ).encode(
-        x=alt.X("FILA DE COBRANZA:N", sort="-y"),
-        y="CUENTAS PAGADAS:Q",
-        text="CUENTAS PAGADAS:Q"
-    )
-
-    st.altair_chart(graf_fila + etiquetas_fila, use_container_width=True)
-except Exception as e:
-    st.warning(f"No se pudo mostrar la gráfica por fila de cobranza: {e}")
-
-st.subheader("📊 Comparativo de Cumplimiento y Productividad por Agente")
-
-# Filtro por fecha
-fechas_disponibles = pd.to_datetime(df["FECHA"].unique())
-fecha_min, fecha_max = fechas_disponibles.min(), fechas_disponibles.max()
-fecha_inicio, fecha_fin = st.date_input("Selecciona el rango de fechas:", [fecha_min, fecha_max])
-
-df_fecha = df[
-    (pd.to_datetime(df["FECHA"]) >= pd.to_datetime(fecha_inicio)) &
-    (pd.to_datetime(df["FECHA"]) <= pd.to_datetime(fecha_fin))
-]
-
-
-# Filtro adicional por agente de cobranza
-agentes_disponibles = sorted(df_fecha["AGENTE DE COBRANZA"].dropna().unique())
-agente_seleccionado = st.selectbox("Selecciona un agente de cobranza:", ["Todos"] + agentes_disponibles)
-
-if agente_seleccionado != "Todos":
-    df_fecha = df_fecha[df_fecha["AGENTE DE COBRANZA"] == agente_seleccionado]
-
-
-# KPIs de cumplimiento por estado
-tabla_estado = df_fecha.pivot_table(
-    index="AGENTE DE COBRANZA",
-    columns="ESTADO DEL PAGO PROMETIDO",
-    values="MONTO DE PAGO",
-    aggfunc="sum",
-    fill_value=0
-).reset_index()
-
-monto_prometido = df_fecha.groupby("AGENTE DE COBRANZA")["MONTO DE PAGO PROMETIDO"].sum().reset_index(name="MONTO PROMETIDO")
-tabla_estado = pd.merge(monto_prometido, tabla_estado, on="AGENTE DE COBRANZA", how="left")
-tabla_estado["% CUMPLIMIENTO"] = ((tabla_estado.get("COMPLETO", 0) + tabla_estado.get("PARCIAL", 0)) / tabla_estado["MONTO PROMETIDO"] * 100).round(2)
-
-st.markdown("### 💰 Monto Prometido vs Pagado por Estado del Pago")
-st.dataframe(tabla_estado)
-
-# Productividad por agente
-tabla_productividad = df_fecha[df_fecha["ESTADO DEL PAGO PROMETIDO"].isin(["COMPLETO", "PARCIAL"])]
-tabla_productividad = tabla_productividad.groupby("AGENTE DE COBRANZA").size().reset_index(name="CUENTAS PAGADAS")
-tabla_productividad = tabla_productividad.sort_values(by="CUENTAS PAGADAS", ascending=False)
-
-st.markdown("### 🏆 Productividad por Agente de Cobranza")
-st.dataframe(tabla_productividad)
-
-# Gráfica: Monto prometido vs pagado por estado (por agente)
-try:
-    df_plot_estado = tabla_estado.copy()
-    df_plot_estado = df_plot_estado.fillna(0)
-    df_plot_estado = df_plot_estado.melt(
-        id_vars=["AGENTE DE COBRANZA"],
-        value_vars=["COMPLETO", "PARCIAL", "PENDIENTE"],
-        var_name="ESTADO DEL PAGO",
-        value_name="MONTO"
-    )
-
-    chart_estado = alt.Chart(df_plot_estado).mark_bar().encode(
-        x=alt.X("AGENTE DE COBRANZA:N", sort="-y", title="Agente de Cobranza"),
-        y=alt.Y("MONTO:Q", title="Monto"),
-        color="ESTADO DEL PAGO:N",
-        tooltip=["AGENTE DE COBRANZA", "ESTADO DEL PAGO", "MONTO"]
-    ).properties(width=800, height=400).configure_axisX(labelAngle=-45)
-
-    st.altair_chart(chart_estado, use_container_width=True)
-except Exception as e:
-    st.warning(f"No se pudo generar la gráfica de montos por estado: {e}")
-
-# Gráfica: Productividad (cuentas con pago)
-try:
-    chart_productividad = alt.Chart(tabla_productividad).mark_bar(size=20).encode(
-        x=alt.X("AGENTE DE COBRANZA:N", sort="-y"),
-        y=alt.Y("CUENTAS PAGADAS:Q", title="Cuentas con Pago"),
-        tooltip=["AGENTE DE COBRANZA", "CUENTAS PAGADAS"]
-    ).properties(width=800, height=400).configure_axisX(labelAngle=-45)
-
-    st.altair_chart(chart_productividad, use_container_width=True)
-except Exception as e:
-    st.warning(f"No se pudo generar la gráfica de productividad: {e}")
 
 # ✅ Sección: Efectividad de Cobranza por Agente (con filtros de fecha, fila y agente)
-st.subheader("✅ Efectividad de Cobranza por Agente (Filtrada)")
-
-# Filtros aplicados
-col_f1, col_f2, col_f3 = st.columns(3)
-with col_f1:
-    filtro_fila = st.selectbox("📁 Fila de Cobranza", ["Todos"] + sorted(df["FILA DE COBRANZA"].dropna().unique().tolist()), key="fila_efectividad")
-with col_f2:
-    filtro_agente = st.selectbox("👤 Agente de Cobranza", ["Todos"] + sorted(df["AGENTE DE COBRANZA"].dropna().unique().tolist()), key="agente_efectividad")
-with col_f3:
-    fechas = st.date_input("📆 Rango de Fechas", [df["FECHA"].min(), df["FECHA"].max()], key="fecha_efectividad")
-
-# Aplicar filtros
-df_ef = df.copy()
-df_ef["FECHA"] = pd.to_datetime(df_ef["FECHA"], errors="coerce")
-if filtro_fila != "Todos":
-    df_ef = df_ef[df_ef["FILA DE COBRANZA"] == filtro_fila]
-if filtro_agente != "Todos":
-    df_ef = df_ef[df_ef["AGENTE DE COBRANZA"] == filtro_agente]
-df_ef = df_ef[(df_ef["FECHA"] >= pd.to_datetime(fechas[0])) & (df_ef["FECHA"] <= pd.to_datetime(fechas[1]))]
-
-# Calcular efectividad
-efectividad_df = calcular_efectividad_por_agente(df_ef)
-if not efectividad_df.empty:
-    st.dataframe(efectividad_df, use_container_width=True)
-    st.bar_chart(efectividad_df.set_index("AGENTE DE COBRANZA"))
-else:
-    st.info("No hay datos disponibles para los filtros seleccionados.")
\ No newline at end of file
+@fragmento
+def mostrar_efectividad_filtrada():
+    with seccion("Efectividad filtrada"):
+        st.subheader("✅ Efectividad de Cobranza por Agente (Filtrada)")
+
+        # Filtros aplicados
+        col_f1, col_f2, col_f3 = st.columns(3)
+        with col_f1:
+            filtro_fila = st.selectbox("📁 Fila de Cobranza", ["Todos"] + filas_cobranza, key="fila_efectividad")
+        with col_f2:
+            filtro_agente = st.selectbox("👤 Agente de Cobranza", ["Todos"] + agentes_cobranza, key="agente_efectividad")
+        with col_f3:
+            fechas = st.date_input("📆 Rango de Fechas", [fecha_min, fecha_max], key="fecha_efectividad")
+
+        # Aplicar filtros sobre el cubo diario
+        cubo_ef = filtrar_cubo(
+            cubo, fechas[0], fechas[1],
+            fila=filtro_fila if filtro_fila != "Todos" else None,
+            agente=filtro_agente if filtro_agente != "Todos" else None
+        )
+
+        # Calcular efectividad
+        efectividad_df = pagos_por_agente(cubo_ef, "CUENTAS CON PAGO")
+        if not efectividad_df.empty:
+            st.dataframe(efectividad_df, use_container_width=True)
+            st.bar_chart(efectividad_df.set_index("AGENTE DE COBRANZA"))
+        else:
+            st.info("No hay datos disponibles para los filtros seleccionados.")
+
+
+# Cuentas de alto riesgo: una fila por CFRNID desde el resumen del índice de cuentas
+@fragmento
+def mostrar_cuentas_alto_riesgo():
+    with seccion("Lista de cuentas de alto riesgo"):
+        st.subheader("🚨 Cuentas de Alto Riesgo")
+        agente = st.selectbox("👤 Agente de Cobranza", ["Todos"] + agentes_cobranza, key="agente_cuentas_riesgo")
+        # El índice se construye la primera vez que se abre el grupo de cuentas
+        indice = obtener_indice(nombre_backend, huella_datos, periodo)
+        riesgo = indice.cuentas_alto_riesgo(agente if agente != "Todos" else None)
+        st.caption(f"{len(riesgo):,} cuentas con promesas pendientes y {DIAS_ALTO_RIESGO}+ días de atraso")
+        mostrar_tabla_paginada(riesgo, "cuentas_riesgo")
+
+
+# Detalle de una cuenta: búsqueda binaria en el índice, sin recorrer el historial
+@fragmento
+def mostrar_detalle_cuenta():
+    with seccion("Detalle de cuenta"):
+        st.subheader("🔎 Detalle por Cuenta (CFRNID)")
+        cfrnid = st.text_input("CFRNID", key="cfrnid_detalle").strip()
+        if not cfrnid:
+            st.info("Ingresa un CFRNID para ver su historial.")
+            return
+        indice = obtener_indice(nombre_backend, huella_datos, periodo)
+        resumen = indice.resumen_cuenta(cfrnid) if cfrnid.isdigit() else None
+        if resumen is None:
+            st.warning(f"No se encontró la cuenta {cfrnid} en el periodo cargado.")
+            return
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Monto prometido", f"{resumen['MONTO PROMETIDO']:,.2f}")
+        col2.metric("Monto pagado", f"{resumen['MONTO PAGADO']:,.2f}")
+        col3.metric("Máx. días de atraso", "—" if pd.isna(resumen["MAX DIAS DE ATRASO"]) else f"{resumen['MAX DIAS DE ATRASO']:,.0f}")
+        col4.metric("Promesas de alto riesgo", f"{resumen['PROMESAS ALTO RIESGO']:,}")
+        st.caption(
+            f"Agente: {resumen['AGENTE DE COBRANZA']} · Fila: {resumen['FILA DE COBRANZA']}"
+            f" · Última promesa: {resumen['ULTIMA PROMESA']} · Último estado: {resumen['ULTIMO ESTADO']}"
+        )
+        st.dataframe(indice.historial_cuenta(cfrnid), use_container_width=True)
+
+
+# Exportación: tablas de KPIs y filas del historial con los filtros elegidos
+@fragmento
+def mostrar_exportacion():
+    with seccion("Exportación"):
+        st.subheader("⬇️ Exportar KPIs y Registros")
+        col_f1, col_f2, col_f3 = st.columns(3)
+        with col_f1:
+            filtro_fila = st.selectbox("📁 Fila de Cobranza", ["Todos"] + filas_cobranza, key="fila_exportacion")
+        with col_f2:
+            filtro_agente = st.selectbox("👤 Agente de Cobranza", ["Todos"] + agentes_cobranza, key="agente_exportacion")
+        with col_f3:
+            fechas = st.date_input("📆 Rango de Fechas", [fecha_min, fecha_max], key="fecha_exportacion")
+        formato = st.radio("Formato", list(FORMATOS), horizontal=True, key="formato_exportacion")
+
+        if len(fechas) != 2:
+            st.info("Selecciona la fecha final del rango.")
+            return
+        # Sin recorte se usan los mismos filtros que las demás secciones, así las tablas salen de la caché de KPIs
+        filtros = Filtros(
+            fecha_inicio=fechas[0] if pd.Timestamp(fechas[0]) > fecha_min else None,
+            fecha_fin=fechas[1] if pd.Timestamp(fechas[1]) < fecha_max else None,
+            fila=filtro_fila if filtro_fila != "Todos" else None,
+            agente=filtro_agente if filtro_agente != "Todos" else None,
+        )
+        kpis = kpis_agentes(backend, filtros)
+        tablas = {
+            "Efectividad": calcular_efectividad_por_agente(None, kpis),
+            "Prometido vs pagado": monto_prometido_vs_pagado(None, kpis),
+            "Alto riesgo": cuentas_alto_riesgo(None, kpis),
+            "DSO RR SR": indicadores_dso_rr_sr(None, kpis),
+            "LPR ACP": indicadores_lpr_acp(None, kpis),
+            "NSR RR": indicadores_nsr_rr(None, kpis),
+            "Atraso por fila": atraso_por_fila_y_estado(backend, filtros),
+            "Estado del pago": distribucion_estado_pago(backend, filtros).set_axis(["Estado", "% del Total"], axis=1),
+        }
+        tablas = {nombre: tabla for nombre, tabla in tablas.items() if "Error" not in tabla.columns}
+        filas = backend.contar_filas(filtros)
+
+        extension, mime = FORMATOS[formato]
+        sufijo = f"{fechas[0]:%Y%m%d}_{fechas[1]:%Y%m%d}"
+        col_kpis, col_filas = st.columns(2)
+        # Los archivos se generan al hacer clic, no en cada recarga
+        col_kpis.download_button(
+            f"📊 KPIs ({len(tablas)} tablas)",
+            lambda: archivo_temporal(exportar_tablas, tablas, formato),
+            file_name=f"kpis_{sufijo}" + (extension if formato == "Excel" else ".zip"),
+            mime=mime if formato == "Excel" else "application/zip",
+            on_click="ignore",
+            key="descargar_kpis",
+        )
+        col_filas.download_button(
+            f"📄 Registros ({filas:,} filas)",
+            lambda: archivo_temporal(exportar_filas, backend.bloques_filas(filtros, columnas_archivo), formato),
+            file_name=f"historial_{sufijo}{extension}",
+            mime=mime,
+            on_click="ignore",
+            disabled=not filas,
+            key="descargar_filas",
+        )
+
+
+# Cada grupo se calcula solo cuando está seleccionado; las secciones con filtros
+# son fragmentos, así que sus widgets vuelven a ejecutar únicamente esa sección
+SECCIONES = {
+    "📋 Datos": [mostrar_columnas, mostrar_vista_general],
+    "👥 KPIs por agente": [
+        mostrar_efectividad,
+        mostrar_monto_prometido_vs_pagado,
+        mostrar_alto_riesgo,
+        mostrar_dso_rr_sr,
+        mostrar_lpr_acp,
+        mostrar_nsr_rr,
+    ],
+    "📈 Tendencias": [mostrar_monto_por_dia, mostrar_kpis_moviles],
+    "📊 Estados y filas": [
+        mostrar_distribucion_estado,
+        mostrar_atraso_por_fila,
+        mostrar_promedio_atraso,
+        mostrar_promedio_atraso_detalle,
+        mostrar_productividad_por_fila,
+    ],
+    "🔎 Cuentas": [mostrar_cuentas_alto_riesgo, mostrar_detalle_cuenta],
+    "🏆 Productividad": [
+        mostrar_productividad_por_agente,
+        mostrar_comparativo_por_agente,
+        mostrar_efectividad_filtrada,
+    ],
+    "⬇️ Exportar": [mostrar_exportacion],
+}
+
+grupo = st.sidebar.radio("Sección", list(SECCIONES), key="seccion_activa")
+for mostrar in SECCIONES[grupo]:
+    mostrar()
+
+mostrar_panel(recarga, historial_recargas(st.session_state), {"cache_kpis": cache_kpis.estadisticas()})
@@ -0,0 +1,139 @@
+import datetime
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_ENTRADAS = int(os.environ.get("DASHBOARD_CACHE_KPIS", "256"))
+
+
+class CacheLRU:
+    """Caché acotada y segura entre hilos; se comparte entre todas las sesiones del proceso."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._candado = threading.Lock()
+
+    def obtener(self, clave, calcular):
+        with self._candado:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+        # Se calcula fuera del candado para no bloquear a otras sesiones
+        valor = calcular()
+        with self._candado:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def limpiar(self) -> None:
+        with self._candado:
+            self._entradas.clear()
+            self.aciertos = self.fallos = 0
+
+    def estadisticas(self) -> dict:
+        with self._candado:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+            }
+
+
+cache_kpis = CacheLRU(MAX_ENTRADAS)
+
+
+# id del objeto -> (referencia débil, huella). Solo vale para el objeto exacto que se
+# marcó: los recortes, copias y objetos que reutilizan el id no están registrados.
+_marcados = {}
+_candado_marcados = threading.RLock()
+
+
+def marcar_huella(objeto, huella: str):
+    """Asocia al objeto (DataFrame o backend) una huella que identifica su contenido."""
+    clave = id(objeto)
+
+    def olvidar(referencia):
+        with _candado_marcados:
+            if _marcados.get(clave, (None,))[0] is referencia:
+                del _marcados[clave]
+
+    with _candado_marcados:
+        _marcados[clave] = (weakref.ref(objeto, olvidar), huella)
+    return objeto
+
+
+def huella_marcada(objeto):
+    with _candado_marcados:
+        entrada = _marcados.get(id(objeto))
+    return entrada[1] if entrada is not None and entrada[0]() is objeto else None
+
+
+def huella_datos(df) -> str:
+    # Los derivados no heredan la marca: cualquier otro DataFrame o Series se hashea
+    huella = huella_marcada(df)
+    if huella is not None:
+        return huella
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()[:16]
+
+
+def _normalizar(valor):
+    """Convierte argumentos de filtro a una forma estable y hashable."""
+    if valor is None or (isinstance(valor, str) and valor in ("", "Todos")):
+        return None
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return ("df", huella_datos(valor))
+    if isinstance(valor, (datetime.date, np.datetime64)):
+        return pd.Timestamp(valor).isoformat()
+    if isinstance(valor, (list, tuple)):
+        return tuple(_normalizar(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _normalizar(v)) for k, v in valor.items()))
+    # Un backend marcado entra en la clave por su huella, así la caché no lo retiene
+    huella = huella_marcada(valor)
+    return ("huella", huella) if huella is not None else valor
+
+
+def memoizar(funcion, cache: CacheLRU = cache_kpis):
+    """Memoiza un KPI por huella de los datos y filtros normalizados.
+
+    Los resultados DataFrame se devuelven como copia y marcados con su propia
+    huella, para que puedan usarse como argumento de otras funciones memoizadas.
+    """
+    nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+    firma = inspect.signature(funcion)
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        # Con los valores por defecto aplicados, f(b) y f(b, SIN_FILTROS) comparten la entrada
+        argumentos = firma.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        clave = (nombre, tuple((k, _normalizar(v)) for k, v in argumentos.arguments.items()))
+
+        def calcular():
+            resultado = funcion(*args, **kwargs)
+            if isinstance(resultado, pd.DataFrame):
+                marcar_huella(resultado, hashlib.sha256(repr(clave).encode()).hexdigest()[:16])
+            return resultado
+
+        resultado = cache.obtener(clave, calcular)
+        if isinstance(resultado, pd.DataFrame):
+            return marcar_huella(resultado.copy(), huella_marcada(resultado))
+        return resultado
+    return envoltura
@@ -0,0 +1,225 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+RECARGAS_GUARDADAS = int(os.environ.get("DASHBOARD_PERF_RECARGAS", "20"))
+
+# Cada sesión de Streamlit ejecuta el script en su propio hilo
+_estado = threading.local()
+# tracemalloc es global al proceso y frena todas las sesiones: se mantiene encendido
+# solo mientras haya alguna recarga midiendo memoria
+_memoria = {"activas": 0, "propio": False}
+_candado_memoria = threading.Lock()
+
+
+class Recarga:
+    """Mediciones de una ejecución completa del script o de un fragmento."""
+
+    def __init__(self, medir_memoria: bool = True):
+        self.inicio = time.time()
+        self.medir_memoria = medir_memoria
+        self.mediciones = []
+        self._pila = []
+        self.terminada = False
+
+    @contextmanager
+    def medir(self, nombre: str, tipo: str, filas_entrada=None):
+        medicion = {
+            "nombre": nombre,
+            "tipo": tipo,
+            "nivel": len(self._pila),
+            "filas_entrada": filas_entrada,
+            "filas_salida": None,
+            "segundos": None,
+            "pico_mb": None,
+            "_pico_hijos": 0,
+        }
+        self.mediciones.append(medicion)
+        if self.medir_memoria:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._pila.append(medicion)
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        finally:
+            medicion["segundos"] = time.perf_counter() - inicio
+            self._pila.pop()
+            if self.medir_memoria:
+                # reset_peak en las mediciones anidadas borra el pico del padre, por eso se propaga
+                pico = max(tracemalloc.get_traced_memory()[1], medicion["_pico_hijos"])
+                medicion["pico_mb"] = (pico - base) / 1e6
+                if self._pila:
+                    padre = self._pila[-1]
+                    padre["_pico_hijos"] = max(padre["_pico_hijos"], pico)
+
+    def como_dict(self) -> dict:
+        return {
+            "inicio": self.inicio,
+            "segundos_total": time.time() - self.inicio,
+            "mediciones": [{k: v for k, v in m.items() if not k.startswith("_")} for m in self.mediciones],
+        }
+
+
+def recarga_actual():
+    return getattr(_estado, "recarga", None)
+
+
+def iniciar_recarga(activo: bool, medir_memoria: bool = True, sesion=None):
+    """Empieza a registrar la recarga del hilo actual; con ``activo`` en False no mide nada.
+
+    Con ``sesion`` (``st.session_state``) se cierra antes la recarga anterior de la
+    sesión si quedó sin terminar, p. ej. porque un widget interrumpió el script.
+    """
+    if sesion is not None:
+        terminar_recarga(sesion.get("perfilado_recarga_activa"))
+    recarga = Recarga(medir_memoria) if activo else None
+    if recarga and medir_memoria:
+        with _candado_memoria:
+            # tracemalloc es global al proceso: con varias sesiones midiendo a la vez los picos se mezclan
+            if _memoria["activas"] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _memoria["propio"] = True
+            _memoria["activas"] += 1
+    _estado.recarga = recarga
+    if sesion is not None:
+        sesion["perfilado_recarga_activa"] = recarga
+    return recarga
+
+
+def terminar_recarga(recarga) -> None:
+    """Deja de medir; apaga tracemalloc cuando ya no queda ninguna recarga midiendo memoria."""
+    if getattr(_estado, "recarga", None) is recarga:
+        _estado.recarga = None
+    if recarga is None or recarga.terminada:
+        return
+    recarga.terminada = True
+    if recarga.medir_memoria:
+        with _candado_memoria:
+            _memoria["activas"] -= 1
+            if _memoria["activas"] == 0 and _memoria["propio"]:
+                tracemalloc.stop()
+                _memoria["propio"] = False
+
+
+def _filas(valor):
+    return len(valor) if isinstance(valor, (pd.DataFrame, pd.Series)) else None
+
+
+@contextmanager
+def seccion(nombre: str, filas_entrada=None):
+    """Mide un bloque de render del dashboard; sin recarga activa no hace nada."""
+    recarga = recarga_actual()
+    if recarga is None:
+        yield {}
+        return
+    with recarga.medir(nombre, "seccion", filas_entrada) as medicion:
+        yield medicion
+
+
+def instrumentar(funcion):
+    """Decorador que registra tiempo, filas de entrada/salida y memoria pico de un KPI."""
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        recarga = recarga_actual()
+        if recarga is None:
+            return funcion(*args, **kwargs)
+        with recarga.medir(funcion.__name__, "kpi", _filas(args[0]) if args else None) as medicion:
+            resultado = funcion(*args, **kwargs)
+            medicion["filas_salida"] = _filas(resultado)
+        return resultado
+    return envoltura
+
+
+def fragmento(funcion):
+    """``st.fragment`` que también mide las recargas parciales del fragmento.
+
+    Dentro de una recarga completa el fragmento se mide como parte de ella. Cuando
+    Streamlit vuelve a ejecutar solo el fragmento (sin pasar por el inicio del
+    script ni por el panel) abre su propia recarga, la guarda en el historial de la
+    sesión y muestra su duración al pie del fragmento.
+    """
+    import streamlit as st
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if recarga_actual() is not None:
+            return funcion(*args, **kwargs)
+        recarga = iniciar_recarga(perfilado_solicitado(st.query_params), sesion=st.session_state)
+        if recarga is None:
+            return funcion(*args, **kwargs)
+        try:
+            with recarga.medir(funcion.__name__, "fragmento"):
+                resultado = funcion(*args, **kwargs)
+        finally:
+            terminar_recarga(recarga)
+            registro = {**recarga.como_dict(), "fragmento": funcion.__name__}
+            historial_recargas(st.session_state).append(registro)
+        # el panel lateral no se redibuja en una recarga parcial
+        st.caption(f"⏱️ Recarga parcial: {registro['segundos_total']:.3f} s")
+        return resultado
+
+    return st.fragment(envoltura)
+
+
+def perfilado_solicitado(query_params) -> bool:
+    """Activado con DASHBOARD_PERF=1 o con ``?perf=1`` en la URL."""
+    if os.environ.get("DASHBOARD_PERF", "").lower() in ("1", "true", "si", "sí"):
+        return True
+    return str(query_params.get("perf", "")).lower() in ("1", "true")
+
+
+def mostrar_panel(recarga, historial: deque, extras: dict = None) -> None:
+    """Panel lateral con la recarga actual y descarga JSON de las últimas recargas.
+
+    ``extras`` se muestra debajo de las mediciones y se guarda junto con la recarga.
+    """
+    if recarga is None:
+        return
+    import streamlit as st
+
+    terminar_recarga(recarga)
+    historial.append({**recarga.como_dict(), **(extras or {})})
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=True):
+        tabla = pd.DataFrame(historial[-1]["mediciones"])
+        if tabla.empty:
+            st.caption("Sin mediciones en esta recarga.")
+        else:
+            tabla["nombre"] = ["  " * nivel + nombre for nivel, nombre in zip(tabla["nivel"], tabla["nombre"])]
+            st.caption(f"Recarga: {historial[-1]['segundos_total']:.3f} s")
+            st.dataframe(
+                tabla[tabla["tipo"] == "seccion"].sort_values("segundos", ascending=False)[
+                    ["nombre", "segundos", "pico_mb"]
+                ],
+                hide_index=True,
+            )
+            st.dataframe(tabla[["nombre", "tipo", "segundos", "filas_entrada", "filas_salida", "pico_mb"]], hide_index=True)
+        parciales = [h for h in historial if h.get("fragmento")]
+        if parciales:
+            st.caption("Recargas parciales (fragmentos)")
+            st.dataframe(pd.DataFrame({
+                "fragmento": [h["fragmento"] for h in parciales],
+                "segundos": [h["segundos_total"] for h in parciales],
+            }).tail(10), hide_index=True)
+        for nombre, valor in (extras or {}).items():
+            st.caption(nombre)
+            st.json(valor)
+        st.download_button(
+            "Descargar últimas recargas (JSON)",
+            json.dumps(list(historial), indent=2, default=str),
+            file_name="perfilado_dashboard.json",
+            mime="application/json",
+        )
+
+
+def historial_recargas(session_state) -> deque:
+    if "perfilado_recargas" not in session_state:
+        session_state["perfilado_recargas"] = deque(maxlen=RECARGAS_GUARDADAS)
+    return session_state["perfilado_recargas"]
@@ -0,0 +1,197 @@
+"""Cálculo de todos los KPIs sin Streamlit, para reportes nocturnos y exportaciones.
+
+Uso:
+    python reporte_kpis.py --particion fila --procesos 8 --formato parquet --salida reportes/
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import kpi_calculations as kpi
+from carga_datos import asegurar_cache
+
+# Sumas aditivas que calcula cada proceso sobre su partición
+SUMAS = {
+    "compute_agent_kpis": kpi.compute_agent_kpis,
+    "sumas_atraso": kpi.sumas_atraso,
+    "conteo_estados": kpi.conteo_estados,
+    "monto_pagado_por_dia": kpi.monto_pagado_por_dia,
+}
+# Cada KPI se deriva de una de las sumas, que recibe en el argumento indicado
+KPIS = {
+    "calcular_efectividad_por_agente": ("compute_agent_kpis", "kpis"),
+    "monto_prometido_vs_pagado": ("compute_agent_kpis", "kpis"),
+    "cuentas_alto_riesgo": ("compute_agent_kpis", "kpis"),
+    "indicadores_dso_rr_sr": ("compute_agent_kpis", "kpis"),
+    "indicadores_lpr_acp": ("compute_agent_kpis", "kpis"),
+    "indicadores_nsr_rr": ("compute_agent_kpis", "kpis"),
+    "productividad_por_agente": ("compute_agent_kpis", "kpis"),
+    "distribucion_estado_pago": ("conteo_estados", "conteos"),
+    "monto_total_por_dia": ("monto_pagado_por_dia", "montos"),
+    "atraso_por_fila_y_estado": ("sumas_atraso", "sumas"),
+}
+SIN_VALOR = "(sin valor)"
+
+
+def particiones(ruta_parquet: str, criterio: str) -> list:
+    """Devuelve (etiqueta, filtros de pyarrow) por cada partición del historial.
+
+    Las filas sin fila de cobranza o sin fecha forman su propia partición, así
+    que la unión de todas las particiones es el historial completo.
+    """
+    if criterio == "ninguna":
+        return [("TOTAL", None)]
+    if criterio == "fila":
+        filas = pq.read_table(ruta_parquet, columns=["FILA DE COBRANZA"]).column(0).to_pandas()
+        tareas = [(str(fila), [("FILA DE COBRANZA", "==", fila)]) for fila in sorted(filas.dropna().unique())]
+        nulos = filas.isna().any()
+        columna = "FILA DE COBRANZA"
+    else:
+        fechas = pq.read_table(ruta_parquet, columns=["FECHA"]).column(0).to_pandas()
+        validas = fechas.dropna()
+        meses = pd.period_range(validas.min(), validas.max(), freq="M") if len(validas) else []
+        tareas = [
+            (str(mes), [("FECHA", ">=", mes.start_time), ("FECHA", "<", (mes + 1).start_time)])
+            for mes in meses
+        ]
+        nulos = fechas.isna().any()
+        columna = "FECHA"
+    if nulos:
+        tareas.append((SIN_VALOR, pc.field(columna).is_null()))
+    return tareas
+
+
+def sumas_parciales(df: pd.DataFrame) -> tuple:
+    """(sumas, segundos de cada una) de una partición; sumadas entre particiones dan las del historial completo."""
+    sumas, tiempos = {}, {}
+    for nombre, funcion in SUMAS.items():
+        inicio = time.perf_counter()
+        sumas[nombre] = funcion(df)
+        tiempos[nombre] = time.perf_counter() - inicio
+    return sumas, tiempos
+
+
+def combinar(parciales: list) -> tuple:
+    """(sumas combinadas, segundos de cada combinación) de las sumas parciales de varias particiones."""
+    sumas, tiempos = {}, {}
+    for nombre in parciales[0]:
+        inicio = time.perf_counter()
+        partes = [parcial[nombre] for parcial in parciales]
+        niveles = list(range(partes[0].index.nlevels))
+        # Los índices categóricos de cada partición pueden tener categorías distintas
+        sumas[nombre] = pd.concat(partes).groupby(level=niveles, sort=True).sum()
+        tiempos[nombre] = time.perf_counter() - inicio
+    return sumas, tiempos
+
+
+def derivar_kpis(sumas: dict) -> tuple:
+    """(tablas de KPIs, segundos de cada una) a partir de las sumas de una partición o del historial completo."""
+    tablas, tiempos = {}, {}
+    for nombre, (suma, argumento) in KPIS.items():
+        inicio = time.perf_counter()
+        tablas[nombre] = getattr(kpi, nombre)(None, **{argumento: sumas[suma]})
+        tiempos[nombre] = time.perf_counter() - inicio
+    return tablas, tiempos
+
+
+def calcular_particion(ruta_parquet: str, etiqueta: str, filtros) -> dict:
+    """Lee solo las filas de la partición y calcula sus sumas parciales, midiendo cada paso."""
+    inicio = time.perf_counter()
+    df = pd.read_parquet(ruta_parquet, filters=filtros)
+    lectura = time.perf_counter() - inicio
+    sumas, tiempos = sumas_parciales(df)
+    return {"etiqueta": etiqueta, "sumas": sumas, "tiempos": {"_lectura": lectura, **tiempos}}
+
+
+def escribir_tabla(tabla: pd.DataFrame, ruta_base: str, formato: str) -> str:
+    ruta = f"{ruta_base}.{formato}"
+    if formato == "parquet":
+        tabla.to_parquet(ruta, index=False)
+    elif formato == "csv":
+        tabla.to_csv(ruta, index=False)
+    else:
+        tabla.to_json(ruta, orient="records", date_format="iso", force_ascii=False)
+    return ruta
+
+
+def ejecutar(origen: str, criterio: str, procesos: int, formato: str, salida: str) -> dict:
+    inicio_total = time.perf_counter()
+    # Garantiza que exista la caché columnar que leen los procesos, sin cargarla aquí
+    ruta_parquet = asegurar_cache(origen)
+    tareas = particiones(ruta_parquet, criterio)
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(calcular_particion, ruta_parquet, etiqueta, filtros) for etiqueta, filtros in tareas]
+        parciales = [futuro.result() for futuro in futuros]
+
+    os.makedirs(salida, exist_ok=True)
+    tiempos = {}
+    if parciales:
+        lecturas = [parcial["tiempos"]["_lectura"] for parcial in parciales]
+        tiempos["_lectura"] = {"total_s": round(sum(lecturas), 6), "max_particion_s": round(max(lecturas), 6)}
+        # Los KPIs se derivan una sola vez de las sumas combinadas: coinciden con los del dashboard
+        sumas, combinacion = combinar([parcial["sumas"] for parcial in parciales])
+        tablas, derivacion = derivar_kpis(sumas)
+        for nombre, (suma, _) in KPIS.items():
+            # Las sumas por agente son comunes a varios KPIs: su tiempo cuenta en cada uno
+            segundos = [parcial["tiempos"][suma] for parcial in parciales]
+            tiempos[nombre] = {
+                "sumas": suma,
+                "sumas_s": round(sum(segundos), 6),
+                "combinacion_s": round(combinacion[suma], 6),
+                "derivacion_s": round(derivacion[nombre], 6),
+                "total_s": round(sum(segundos) + combinacion[suma] + derivacion[nombre], 6),
+                "max_particion_s": round(max(segundos), 6),
+            }
+        for nombre, tabla in tablas.items():
+            escribir_tabla(tabla, os.path.join(salida, nombre), formato)
+
+        if criterio != "ninguna":
+            # Desglose adicional: los mismos KPIs calculados dentro de cada partición
+            por_particion = {}
+            for parcial in parciales:
+                for nombre, tabla in derivar_kpis(parcial["sumas"])[0].items():
+                    tabla = tabla.reset_index(drop=True)
+                    tabla.insert(0, "PARTICION", parcial["etiqueta"])
+                    por_particion.setdefault(nombre, []).append(tabla)
+            for nombre, tablas_particion in por_particion.items():
+                escribir_tabla(
+                    pd.concat(tablas_particion, ignore_index=True), os.path.join(salida, f"{nombre}_por_particion"), formato
+                )
+
+    resumen = {
+        "particion": criterio,
+        "particiones": len(tareas),
+        "procesos": procesos,
+        "tiempo_total_s": round(time.perf_counter() - inicio_total, 6),
+        "kpis": tiempos,
+    }
+    with open(os.path.join(salida, "tiempos.json"), "w", encoding="utf-8") as f:
+        json.dump(resumen, f, indent=2, ensure_ascii=False)
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula todos los KPIs de cobranza sin abrir el dashboard.")
+    parser.add_argument("--origen", default=os.path.join("data", "Historial_Pagos_Prestamos.xlsx"))
+    parser.add_argument("--particion", choices=["ninguna", "fila", "mes"], default="ninguna")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    parser.add_argument("--formato", choices=["parquet", "csv", "json"], default="parquet")
+    parser.add_argument("--salida", default="reportes")
+    args = parser.parse_args()
+
+    resumen = ejecutar(args.origen, args.particion, args.procesos, args.formato, args.salida)
+    print(f"{resumen['particiones']} particiones en {resumen['tiempo_total_s']:.2f} s")
+    for nombre, tiempo in resumen["kpis"].items():
+        maximo = f"  (máx. por partición {tiempo['max_particion_s']:.4f} s)" if "max_particion_s" in tiempo else ""
+        print(f"  {nombre:<35} {tiempo['total_s']:>10.4f} s{maximo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from perfilado import instrumentar
+
+# (máximo de días del rango, frecuencia de pandas, etiqueta)
+FRECUENCIAS = [
+    (120, "D", "Diaria"),
+    (730, "W-MON", "Semanal"),
+    (None, "MS", "Mensual"),
+]
+PUNTOS_MAXIMOS = 500
+
+
+def frecuencia_para_rango(fecha_inicio, fecha_fin) -> tuple:
+    """Frecuencia de pandas y su etiqueta según los días que abarca el rango."""
+    dias = (pd.Timestamp(fecha_fin) - pd.Timestamp(fecha_inicio)).days + 1
+    for maximo, frecuencia, etiqueta in FRECUENCIAS:
+        if maximo is None or dias <= maximo:
+            return frecuencia, etiqueta
+
+
+@instrumentar
+def remuestrear(diario: pd.DataFrame, frecuencia: str, columna_fecha: str = "FECHA") -> pd.DataFrame:
+    """Suma los totales diarios por periodo; cada periodo se etiqueta con su fecha de inicio."""
+    if diario.empty or frecuencia == "D":
+        return diario
+    serie = diario.set_index(columna_fecha).resample(frecuencia, label="left", closed="left").sum()
+    return serie.rename_axis(columna_fecha).reset_index()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """Índices elegidos por Largest-Triangle-Three-Buckets, que conserva picos y valles.
+
+    Siempre incluye el primer y el último punto; ``x`` debe ser creciente.
+    """
+    n = len(x)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(int)
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Vértice fijo del triángulo: promedio del siguiente cubo (o el último punto)
+        siguiente_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+        x_sig = x[fin:siguiente_fin].mean()
+        y_sig = y[fin:siguiente_fin].mean()
+        areas = np.abs(
+            (x[anterior] - x_sig) * (y[inicio:fin] - y[anterior])
+            - (x[anterior] - x[inicio:fin]) * (y_sig - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        elegidos[i + 1] = anterior
+    return elegidos
+
+
+@instrumentar
+def reducir_puntos(serie: pd.DataFrame, puntos: int = PUNTOS_MAXIMOS, columna_fecha: str = "FECHA",
+                   columna_valor: str = "MONTO TOTAL") -> pd.DataFrame:
+    """Recorta la serie a ``puntos`` con LTTB; si ya cabe se devuelve igual."""
+    if len(serie) <= puntos:
+        return serie
+    x = serie[columna_fecha].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    indices = lttb(x, serie[columna_valor].fillna(0).to_numpy(), puntos)
+    return serie.iloc[indices].reset_index(drop=True)
@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+TAMANOS_PAGINA = [25, 50, 100, 250, 500]
+
+
+def _mascara_busqueda(df: pd.DataFrame, texto: str, columnas: list = None) -> np.ndarray:
+    """Filas donde alguna columna de texto contiene ``texto`` (sin distinguir mayúsculas)."""
+    texto = texto.lower()
+    mascara = np.zeros(len(df), dtype=bool)
+    for col in df.columns if columnas is None else columnas:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Se busca en el diccionario de categorías y se compara por código
+            coinciden = [i for i, cat in enumerate(serie.cat.categories) if texto in str(cat).lower()]
+            if coinciden:
+                mascara |= np.isin(serie.cat.codes.to_numpy(), coinciden)
+        elif pd.api.types.is_string_dtype(serie) or serie.dtype == object:
+            mascara |= serie.astype(str).str.lower().str.contains(texto, regex=False).to_numpy()
+        elif pd.api.types.is_integer_dtype(serie) and texto.isdigit():
+            mascara |= serie.astype(str).str.contains(texto, regex=False).to_numpy()
+    return mascara
+
+
+def preparar_pagina(
+    df: pd.DataFrame,
+    busqueda: str = "",
+    filtros: dict = None,
+    orden: str = None,
+    ascendente: bool = True,
+    pagina: int = 1,
+    tam_pagina: int = 50,
+    columnas: list = None,
+):
+    """Filtra, ordena y recorta en el servidor; devuelve (página, filas filtradas, total de páginas).
+
+    ``columnas`` limita la búsqueda y la página devuelta a esas columnas.
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    for col, valores in (filtros or {}).items():
+        if valores:
+            mascara &= df[col].isin(valores).to_numpy()
+    if busqueda:
+        mascara &= _mascara_busqueda(df, busqueda, columnas)
+
+    posiciones = np.flatnonzero(mascara)
+    if orden:
+        valores_orden = df[orden].iloc[posiciones].reset_index(drop=True)
+        posiciones = posiciones[valores_orden.sort_values(ascending=ascendente, kind="stable").index.to_numpy()]
+
+    total_paginas = max(1, math.ceil(len(posiciones) / tam_pagina))
+    pagina = min(max(1, pagina), total_paginas)
+    inicio = (pagina - 1) * tam_pagina
+    pagina_df = df.iloc[posiciones[inicio:inicio + tam_pagina]]
+    if columnas is not None:
+        pagina_df = pagina_df[columnas]
+    return pagina_df, len(posiciones), total_paginas
+
+
+class FuenteDataFrame:
+    """Origen de filas en memoria para ``mostrar_tabla_paginada``.
+
+    Cualquier objeto con estos métodos (p. ej. un backend SQL) puede usarse como fuente.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def columnas(self) -> list:
+        return self.df.columns.tolist()
+
+    def columnas_categoricas(self) -> list:
+        return [c for c in self.df.columns if isinstance(self.df[c].dtype, pd.CategoricalDtype)]
+
+    def opciones(self, columna: str) -> list:
+        return sorted(self.df[columna].dropna().unique().tolist())
+
+    def total_filas(self) -> int:
+        return len(self.df)
+
+    def preparar_pagina(self, busqueda="", filtros=None, orden=None, ascendente=True, pagina=1, tam_pagina=50, columnas=None):
+        return preparar_pagina(self.df, busqueda, filtros, orden, ascendente, pagina, tam_pagina, columnas)
+
+
+def mostrar_tabla_paginada(fuente, clave: str, tam_pagina: int = 50, columnas_filtro: list = None, columnas: list = None) -> None:
+    """Tabla con búsqueda, filtros por columna, orden y paginación; solo se envía la página visible.
+
+    ``columnas`` proyecta la tabla: las demás columnas de la fuente no se muestran ni se buscan.
+    """
+    if isinstance(fuente, pd.DataFrame):
+        fuente = FuenteDataFrame(fuente)
+    if columnas_filtro is None:
+        columnas_filtro = [c for c in fuente.columnas_categoricas() if columnas is None or c in columnas]
+
+    col_busqueda, col_orden, col_sentido, col_tam = st.columns([3, 2, 1, 1])
+    busqueda = col_busqueda.text_input("🔎 Buscar", key=f"{clave}_busqueda")
+    orden = col_orden.selectbox("Ordenar por", ["(sin orden)"] + (columnas or fuente.columnas()), key=f"{clave}_orden")
+    ascendente = col_sentido.radio("Sentido", ["Asc", "Desc"], key=f"{clave}_sentido") == "Asc"
+    tamanos = sorted(set(TAMANOS_PAGINA + [tam_pagina]))
+    tam = col_tam.selectbox("Filas por página", tamanos, index=tamanos.index(tam_pagina), key=f"{clave}_tam")
+
+    filtros = {}
+    if columnas_filtro:
+        with st.expander("Filtros por columna"):
+            celdas = st.columns(min(len(columnas_filtro), 4))
+            for i, col in enumerate(columnas_filtro):
+                opciones = fuente.opciones(col)
+                filtros[col] = celdas[i % len(celdas)].multiselect(col, opciones, key=f"{clave}_filtro_{col}")
+
+    clave_pagina = f"{clave}_pagina"
+    pagina_df, filas, total_paginas = fuente.preparar_pagina(
+        busqueda, filtros, None if orden == "(sin orden)" else orden, ascendente,
+        st.session_state.get(clave_pagina, 1), tam, columnas=columnas
+    )
+    # Un filtro más estricto puede dejar la página seleccionada fuera de rango
+    if st.session_state.get(clave_pagina, 1) > total_paginas:
+        st.session_state[clave_pagina] = total_paginas
+    pagina = st.session_state.get(clave_pagina, 1)
+    st.dataframe(pagina_df, use_container_width=True)
+
+    col_pagina, col_info = st.columns([1, 3])
+    col_pagina.number_input("Página", min_value=1, max_value=total_paginas, step=1, key=clave_pagina)
+    inicio = (pagina - 1) * tam
+    col_info.caption(
+        f"Filas {inicio + 1 if filas else 0:,}–{min(inicio + tam, filas):,} de {filas:,}"
+        f" (total {fuente.total_filas():,}) · página {pagina} de {total_paginas}"
+    )